@@ -14,6 +14,9 @@ class InputConfig(BaseModel):
 
 class OutputConfig(BaseModel):
     fields: List[FieldConfig]
+    # Give the model a final_answer tool taking the output fields, so its last turn is
+    # the structured output and free-text parsing / LLM reformatting is only a fallback
+    structured_output: bool = False
 
 class AgentConfig(BaseModel):
     name: str
@@ -21,15 +24,44 @@ class AgentConfig(BaseModel):
     color: Optional[str] = None
     input: InputConfig
     output: OutputConfig
+    max_tool_concurrency: int = Field(default=8, gt=0)  # tool calls from one model turn run in parallel up to this
+
+class CacheConfig(BaseModel):
+    """In-process LRU + TTL cache settings"""
+    enabled: bool = True
+    ttl_seconds: float = 300
+    max_entries: int = 1024
+    persist: bool = False  # also keep entries in the shared on-disk cache
+
+class ToolCacheConfig(CacheConfig):
+    """Result cache for a deterministic tool or idempotent API"""
+    key_fields: Optional[List[str]] = None  # arguments that identify a call, all of them if unset
 
 class RAGConfig(BaseModel):
-    provider: Literal["databricks"] = "databricks"
+    provider: Literal["databricks", "local"] = "databricks"
     index_name: str
-    endpoint: str
+    endpoint: Optional[str] = Field(default=None, validate_default=True)  # required for the databricks provider
     embedding_model: Literal["databricks-bge-small"] = "databricks-bge-small"
     embedding_endpoint: str = "databricks-bge-small"
-    chunk_size: Literal[500] = 500
-    top_k: Literal[5] = 5
+    chunk_size: int = Field(default=500, gt=0)
+    top_k: int = Field(default=5, gt=0)
+    max_context_tokens: int = Field(default=1000, gt=0)  # budget for retrieved context in the prompt
+    context_diversity: float = Field(default=0.3, ge=0, le=1)  # 0 = pure relevance, 1 = favor novel chunks
+    hybrid_search: bool = False  # fuse vector results with a local BM25 keyword index
+    retrieval_timeout_seconds: Optional[float] = Field(default=5.0, gt=0)  # past this, run without context
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    # Local provider only
+    local_path: Optional[str] = None  # defaults to .langsketch-index/<index_name>
+    embedding_function: Optional[str] = None  # "path/to/file.py:function_name", hashing embedder if unset
+    index_type: Literal["flat", "ivf"] = "flat"
+
+    @field_validator('endpoint')
+    @classmethod
+    def validate_endpoint_based_on_provider(cls, v, info):
+        if hasattr(info, 'data') and info.data:
+            if info.data.get('provider') == "databricks" and not v:
+                raise ValueError("endpoint is required when provider is 'databricks'")
+        return v
 
 class ToolInputConfig(BaseModel):
     fields: List[FieldConfig]
@@ -38,6 +70,12 @@ class ToolOutputConfig(BaseModel):
     is_array: bool = False
     fields: List[FieldConfig]
 
+class SandboxConfig(BaseModel):
+    """Run a file-based tool in a separate worker process"""
+    timeout_seconds: Optional[float] = Field(default=30, gt=0)  # the worker is killed past this
+    memory_limit_mb: Optional[int] = Field(default=1024, gt=0)  # address-space limit per worker (Unix only)
+    max_calls_per_worker: int = Field(default=100, gt=0)  # workers are replaced after this many calls
+
 class ToolConfig(BaseModel):
     name: str
     description: str
@@ -45,6 +83,9 @@ class ToolConfig(BaseModel):
     output: ToolOutputConfig
     code_path: str
     function_name: str
+    cache: Optional[ToolCacheConfig] = None
+    sandbox: Optional[SandboxConfig] = None  # file-based tools only
+    coalesce: bool = False  # concurrent calls with identical arguments share one execution
 
 class AuthConfig(BaseModel):
     type: Literal["api-key", "none"]
@@ -67,6 +108,16 @@ class APIExampleConfig(BaseModel):
     """Handles the example usage field in APIs"""
     usage: Optional[str] = None
 
+class RetryConfig(BaseModel):
+    """Retry and circuit breaker settings for an API"""
+    max_attempts: int = Field(default=3, ge=1)  # only idempotent methods are retried
+    backoff_base_seconds: float = Field(default=0.5, ge=0)
+    backoff_max_seconds: float = Field(default=8, ge=0)
+    retry_on_status: List[int] = Field(default_factory=lambda: [429, 502, 503, 504])
+    max_retry_after_seconds: float = 30  # a longer Retry-After is returned as an error instead
+    circuit_failure_threshold: int = Field(default=5, ge=1)
+    circuit_reset_seconds: float = Field(default=30, gt=0)
+
 class APIConfig(BaseModel):
     name: str
     url: str
@@ -76,6 +127,13 @@ class APIConfig(BaseModel):
     auth: AuthConfig
     description: str
     example: Optional[APIExampleConfig] = None
+    cache: Optional[ToolCacheConfig] = None
+    coalesce: bool = False  # share one in-flight request between identical concurrent calls (idempotent methods only)
+    # Output name -> dotted path or JSONPath into the JSON body, e.g. {"temp": "$.current.temp_c"}
+    projection: Optional[Dict[str, str]] = None
+    max_response_chars: Optional[int] = Field(default=8000, gt=0)  # longer results are truncated
+    timeout_seconds: float = Field(default=30, gt=0)
+    retry: RetryConfig = Field(default_factory=RetryConfig)
 
 class ScrapingConfig(BaseModel):
     name: str
@@ -1,62 +1,155 @@
 from .agent_models import AgentSystemConfig, FieldConfig, ToolConfig, ToolInputConfig, ToolOutputConfig
-from .tool_loader import create_langchain_tool
+from .tool_loader import DynamicLangChainTool, ToolConcurrencyLimiter, create_langchain_tool
 from .utilities import UTILITY_FUNCTIONS, UTILITY_CONFIGS
-from .llm_router import setup_intelligent_router
+from .runtime_context import get_runtime_context
+from .model_selection import select_model
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
-from typing import Dict, Any, Type, List
-from pathlib import Path
+from typing import Dict, Any, Type, List, AsyncIterator, Tuple, Optional, Callable
+from dataclasses import dataclass
 from pydantic import BaseModel, ValidationError, create_model
 from .deimos_wrapper import DeimosCompatibleChatOpenAI
-from databricks.vector_search.client import VectorSearchClient
+from langchain_core.messages import AIMessageChunk
+from .session_memory import BoundedMemorySaver
+from .json_repair import parse_json_lenient
+from .context_packing import estimate_tokens, pack_context
+from .ingestion import open_index
+from .reranking import reciprocal_rank_fusion, rerank
+from .caching import get_cache
+from .http_pool import aclose_http_client
+import asyncio
+import concurrent.futures
 import json
 import re
+import threading
 import time
-from deimos_router import get_router
-from .blackbox import test_local
+import uuid
 
-current_dir = Path(__file__).resolve().parent
 
-config_path = current_dir.parent / ".langsketch-credentials.json"
+class OutputValidationError(Exception):
+    """Custom exception for output validation failures"""
+    pass
 
-# Load the JSON
-with open(config_path, "r", encoding="utf-8") as f:
-    config = json.load(f)
+class InputValidationError(Exception):
+    """Custom exception for input validation failures"""
+    pass
 
-WORKSPACE_URL = None
-PERSONAL_TOKEN = None
-MARTIAN_KEY = None
 
-for entry in config.get("llmKeys", []):
-    if entry.get("provider") == "martian":
-        MARTIAN_KEY = entry.get("apiKey")
-        break
+_NUMBER_PATTERN = re.compile(r'-?\d+\.?\d*')
+_TRUE_PATTERN = re.compile(r'\b(true|yes|1)\b', re.IGNORECASE)
+_FALSE_PATTERN = re.compile(r'\b(false|no|0)\b', re.IGNORECASE)
+_LIST_SPLIT_PATTERN = re.compile(r'[,;\n]')
 
-databricks_creds = config.get("databricksCredentials", [])
-if databricks_creds:
-    creds = databricks_creds[0] 
-    WORKSPACE_URL = creds.get("workspaceUrl")
-    PERSONAL_TOKEN = creds.get("personalToken")
+# Candidates fetched from each retriever per requested chunk when hybrid search is on
+HYBRID_CANDIDATE_MULTIPLIER = 3
 
-# Initialize Databricks client
-if WORKSPACE_URL and PERSONAL_TOKEN:
-    client = VectorSearchClient(
-        workspace_url=WORKSPACE_URL,
-        personal_access_token=PERSONAL_TOKEN
-    )
-else:
-    raise ValueError("Databricks credentials not found in JSON.")
+# Worker threads that run retrieval alongside input validation in run()
+RETRIEVAL_WORKERS = 16
+_retrieval_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_retrieval_executor_lock = threading.Lock()
 
 
-router_name = setup_intelligent_router()
-class OutputValidationError(Exception):
-    """Custom exception for output validation failures"""
-    pass
+def _get_retrieval_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _retrieval_executor
+    with _retrieval_executor_lock:
+        if _retrieval_executor is None:
+            _retrieval_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+            )
+        return _retrieval_executor
 
-class InputValidationError(Exception):
-    """Custom exception for input validation failures"""
-    pass
+
+def _to_string(value: Any, field_name: str) -> str:
+    return str(value)
+
+
+def _to_integer(value: Any, field_name: str) -> int:
+    try:
+        # Clean the value by stripping whitespace and newlines
+        cleaned_value = str(value).strip().strip('\n\r\t')
+        return int(float(cleaned_value))  # Handle "123.0" -> 123
+    except (ValueError, TypeError):
+        raise OutputValidationError(f"Cannot convert '{value}' to integer for field '{field_name}'")
+
+
+def _to_float(value: Any, field_name: str) -> float:
+    try:
+        # Clean the value by stripping whitespace and newlines
+        cleaned_value = str(value).strip().strip('\n\r\t')
+        return float(cleaned_value)
+    except (ValueError, TypeError):
+        raise OutputValidationError(f"Cannot convert '{value}' to float for field '{field_name}'")
+
+
+def _to_boolean(value: Any, field_name: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    elif isinstance(value, str):
+        lower_val = value.lower().strip()
+        if lower_val in ['true', 'yes', '1', 'on']:
+            return True
+        elif lower_val in ['false', 'no', '0', 'off']:
+            return False
+        else:
+            raise OutputValidationError(f"Cannot convert '{value}' to boolean for field '{field_name}'")
+    elif isinstance(value, (int, float)):
+        return bool(value)
+    else:
+        raise OutputValidationError(f"Cannot convert '{value}' to boolean for field '{field_name}'")
+
+
+def _to_list(value: Any, field_name: str) -> list:
+    if isinstance(value, list):
+        return value
+    elif isinstance(value, str):
+        try:
+            # Try to parse as JSON array
+            parsed = json.loads(value)
+            if isinstance(parsed, list):
+                return parsed
+        except json.JSONDecodeError:
+            # Split by common delimiters
+            return [item.strip() for item in _LIST_SPLIT_PATTERN.split(value) if item.strip()]
+    else:
+        return [value]
+
+
+def _to_dict(value: Any, field_name: str) -> dict:
+    if isinstance(value, dict):
+        return value
+    elif isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            # Return as single key-value pair
+            return {"value": value}
+    else:
+        return {"value": value}
+
+
+_FIELD_CONVERTERS = {
+    'string': _to_string, 'str': _to_string,
+    'integer': _to_integer, 'int': _to_integer,
+    'float': _to_float, 'number': _to_float,
+    'boolean': _to_boolean, 'bool': _to_boolean,
+    'list': _to_list, 'array': _to_list,
+    'dict': _to_dict, 'object': _to_dict,
+}
+
+
+# Terminal tool the model calls with its answer in structured output mode
+FINAL_ANSWER_TOOL = "final_answer"
+
+
+@dataclass(frozen=True)
+class _OutputFieldPlan:
+    """Precomputed validation steps for one output field"""
+    name: str
+    type: str
+    required: bool
+    converter: Callable[[Any, str], Any]
+    json_pattern: re.Pattern
+    kv_pattern: re.Pattern
 
 
 class AgentRuntime:
@@ -66,7 +159,12 @@ class AgentRuntime:
         self.tools = []
         self.vector_store = None
         self.index = None
+        self.keyword_index = None
+        self.retrieval_cache = None
         self.builtin_tools = {}
+        self.memory = None
+        self.output_stats = {"direct": 0, "llm_formatter": 0, "fallback": 0}
+        self._output_stats_lock = threading.Lock()
         
         # Initialize all components
         self._setup_llm()
@@ -76,38 +174,158 @@ class AgentRuntime:
         self._setup_tools()
         self._setup_scrapers()
         self._create_agent()
+        
+        # Validation plan built once and shared by every run (and every item of a batch)
+        self.input_model = self._create_input_model()
+        self.output_plan = self._build_output_plan()
     
     def _setup_llm(self) -> None:
-        router = get_router(router_name)
-        
-        if router is None:
-            raise ValueError(f"Router {router_name} not found. Available routers: {list(get_router.__globals__['_router_registry'].keys())}")
-        
         # Prepare comprehensive description of the agent system for optimal routing
-        request_data = {
-            'messages': AgentSystemConfig.generate_router_description(self.config)
-        }
+        description = AgentSystemConfig.generate_router_description(self.config)
         
-        selected_model = router.select_model(request_data)
+        # Cached per description and rule set, so warm builds skip the router entirely
+        selected_model = select_model(description)
         print(selected_model)
 
         self.llm = DeimosCompatibleChatOpenAI(
             model=selected_model,
-            api_key=MARTIAN_KEY,
+            api_key=get_runtime_context().martian_key,
             base_url="https://api.withmartian.com/v1",
         )
 
     def _setup_rag(self) -> None:
-        self.index = client.get_index(endpoint_name=self.config.rag.endpoint, index_name=self.config.rag.index_name)
+        if self.config.rag is None:
+            return
+        
+        self.index = open_index(self.config.rag)
+        if self.config.rag.hybrid_search:
+            # Imported here so agents without hybrid search never touch the keyword store
+            from .keyword_index import get_keyword_index
+            
+            self.keyword_index = get_keyword_index(self.config.rag)
+        
+        if self.config.rag.provider == "local":
+            # Local searches are sub-millisecond, caching them would only add staleness
+            return
+        
+        # Shared by every agent in the process; keys include the index name
+        cache_config = self.config.rag.cache
+        if cache_config.enabled:
+            self.retrieval_cache = get_cache(
+                "retrieval",
+                max_entries=cache_config.max_entries,
+                ttl_seconds=cache_config.ttl_seconds,
+                persist=cache_config.persist,
+            )
+    
+    def _retrieval_cache_key(self, prompt: str, num_results: int) -> str:
+        # Case and whitespace differences don't change what we want to retrieve
+        normalized_query = " ".join(prompt.lower().split())
+        mode = "hybrid" if self.keyword_index is not None else "vector"
+        return f"{self.config.rag.index_name}|{mode}|{num_results}|{normalized_query}"
     
     def _get_context(self, prompt: str) -> List[str]:
-        # Retrieve top 3 chunks
-        relevant_chunks = self.index.similarity_search(num_results=3, columns=["text"], query_text=prompt)
-        data_array = relevant_chunks['result']['data_array']
-        raw_texts = [row[0] for row in data_array]  
+        if self.index is None:
+            return []
+        
+        raw_texts = self._retrieve(prompt, self.config.rag.top_k)
+        context = pack_context(
+            raw_texts,
+            max_tokens=self.config.rag.max_context_tokens,
+            diversity=self.config.rag.context_diversity,
+        )
+        
+        print(f"[INFO] Packed {len(context)} of {len(raw_texts)} retrieved chunks "
+              f"(~{sum(estimate_tokens(chunk) for chunk in context)} of {sum(estimate_tokens(chunk) for chunk in raw_texts)} tokens)")
+        return context
+    
+    def _retrieve(self, prompt: str, num_results: int) -> List[str]:
+        """Return the texts of the top num_results chunks for prompt, most relevant first"""
+        cache_key = None
+        if self.retrieval_cache is not None:
+            cache_key = self._retrieval_cache_key(prompt, num_results)
+            cached_texts = self.retrieval_cache.get(cache_key)
+            if cached_texts is not None:
+                return cached_texts
+        
+        if self.keyword_index is None:
+            raw_texts = self._vector_search(prompt, num_results)
+        else:
+            # Over-fetch from both retrievers, fuse the rankings and keep the best num_results
+            pool_size = num_results * HYBRID_CANDIDATE_MULTIPLIER
+            vector_texts = self._vector_search(prompt, pool_size)
+            keyword_texts = [text for text, _ in self.keyword_index.search(prompt, pool_size)]
+            fused_scores = reciprocal_rank_fusion([vector_texts, keyword_texts])
+            raw_texts = rerank(prompt, fused_scores, num_results)
+        
+        if cache_key is not None:
+            self.retrieval_cache.set(cache_key, raw_texts)
         
         return raw_texts
     
+    def _start_context(self, input_data: Dict[str, Any]) -> Optional[concurrent.futures.Future]:
+        """Start retrieval for the raw input in the background, so it overlaps validation"""
+        if self.index is None:
+            return None
+        return _get_retrieval_executor().submit(self._get_context, str(input_data))
+    
+    def _finish_context(self, future: Optional[concurrent.futures.Future]) -> List[str]:
+        """Wait for background retrieval up to the configured deadline; too slow means no context"""
+        if future is None:
+            return []
+        
+        timeout = self.config.rag.retrieval_timeout_seconds
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            print(f"[WARNING] Retrieval exceeded {timeout}s, running without context")
+            return []
+    
+    def _astart_context(self, input_data: Dict[str, Any]) -> Optional[asyncio.Future]:
+        """Submit retrieval right away (the vector search client is synchronous), so it overlaps validation"""
+        if self.index is None:
+            return None
+        # The shared retrieval pool (not the loop's default executor) keeps a retrieval
+        # abandoned at its deadline from holding up asyncio.run() shutdown
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(_get_retrieval_executor(), self._get_context, str(input_data))
+    
+    async def _afinish_context(self, future: Optional[asyncio.Future]) -> List[str]:
+        if future is None:
+            return []
+        
+        timeout = self.config.rag.retrieval_timeout_seconds
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"[WARNING] Retrieval exceeded {timeout}s, running without context")
+            return []
+    
+    @staticmethod
+    def _cancel_context(future: Optional[asyncio.Future]) -> None:
+        """Drop a background retrieval whose run failed before it was needed"""
+        if future is not None and not future.done():
+            future.cancel()
+    
+    def _vector_search(self, prompt: str, num_results: int) -> List[str]:
+        relevant_chunks = self.index.similarity_search(num_results=num_results, columns=["text"], query_text=prompt)
+        data_array = relevant_chunks['result']['data_array']
+        return [row[0] for row in data_array]
+    
+    def get_tool_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters per tool that has a result cache"""
+        return {
+            tool.name: tool.get_cache_stats()
+            for tool in self.tools
+            if isinstance(tool, DynamicLangChainTool) and tool.result_cache is not None
+        }
+    
+    def get_retrieval_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the retrieval cache (empty if caching is off)"""
+        if self.retrieval_cache is None:
+            return {}
+        return self.retrieval_cache.stats()
+
     def _setup_apis(self) -> None:
         """Setup API integration tools"""
         if not hasattr(self.config, 'apis') or self.config.apis is None:
@@ -142,23 +360,34 @@ class AgentRuntime:
                 )
             )
             
+            if api.projection:
+                # The tool returns only the projected fields
+                output_fields = [
+                    FieldConfig(name=name, type="object", description=f"Value of {path} in the API response", required=False)
+                    for name, path in api.projection.items()
+                ]
+            else:
+                output_fields = [
+                    FieldConfig(
+                        name="response",
+                        type="str",
+                        description="Response from the API call",
+                        required=True
+                    )
+                ]
+            
             api_tool_config = ToolConfig(
                 name=api.name,
                 description=api.description,
                 inputs=ToolInputConfig(fields=input_fields),
                 output=ToolOutputConfig(
                     is_array=False,
-                    fields=[
-                        FieldConfig(
-                            name="response",
-                            type="str",
-                            description="Response from the API call",
-                            required=True
-                        )
-                    ]
+                    fields=output_fields
                 ),
                 code_path="__api__",
-                function_name=api.name.lower().replace(" ", "_").replace("-", "_")
+                function_name=api.name.lower().replace(" ", "_").replace("-", "_"),
+                cache=api.cache,
+                coalesce=api.coalesce,
             )
             
             # Add to tools list for processing in _setup_tools
@@ -250,13 +479,27 @@ class AgentRuntime:
     def _create_agent(self) -> None:
         """Create and configure the agent with all loaded tools using LangGraph"""
         try:
-            # Initialize memory checkpoint for multi-turn conversations
-            memory = MemorySaver()
+            # Initialize memory checkpoint for multi-turn conversations, bounded so
+            # long-lived processes don't accumulate every session forever
+            memory = BoundedMemorySaver()
+            self.memory = memory
+
+            # Tool calls from one model turn run concurrently; cap them per agent
+            limiter = ToolConcurrencyLimiter(self.config.agent.max_tool_concurrency)
+            for tool in self.tools:
+                if isinstance(tool, DynamicLangChainTool):
+                    tool.concurrency_limiter = limiter
+
+            # Opt-in: the model's last turn is a final_answer call whose arguments are the
+            # output, so no separate formatting call is needed
+            tools = list(self.tools)
+            if self.config.agent.output.structured_output:
+                tools.append(self._create_final_answer_tool())
 
             # Create the agent using LangGraph's create_react_agent
             self.agent = create_react_agent(
                 model=self.llm,
-                tools=self.tools,
+                tools=tools,
                 checkpointer=memory,
                 interrupt_before=None,  #
                 interrupt_after=None,
@@ -268,27 +511,40 @@ class AgentRuntime:
             print(f"[ERROR] Failed to create agent: {str(e)}")
             self.agent = None
     
+    def _build_output_plan(self) -> List["_OutputFieldPlan"]:
+        """Resolve converters and compile extraction patterns for every output field once"""
+        plan = []
+        
+        for field in self.config.agent.output.fields:
+            field_name = field.name
+            field_type = field.type.lower()
+            escaped_name = re.escape(field_name)
+            
+            plan.append(_OutputFieldPlan(
+                name=field_name,
+                type=field_type,
+                required=getattr(field, 'required', True),
+                converter=_FIELD_CONVERTERS.get(field_type, _to_string),
+                json_pattern=re.compile(rf'["\']?{escaped_name}["\']?\s*:\s*([^,\n\}}]+)', re.IGNORECASE),
+                kv_pattern=re.compile(rf'{escaped_name}\s*[=:]\s*([^\n,]+)', re.IGNORECASE),
+            ))
+        
+        return plan
+
     def _validate_output_structure(self, output: Any) -> Dict[str, Any]:
         """Validate and transform agent output to match OutputConfig"""
-        expected_output = self.config.agent.output
-        
-        # If the output is a string, try to parse it as JSON first
+        # If the output is a string, try to parse it as JSON first, tolerating code
+        # fences, trailing commas, single quotes and truncated tails
         if isinstance(output, str):
-            try:
-                # Clean the string by stripping whitespace and newlines
-                cleaned_output = output.strip().strip('\n\r\t')
-                parsed_output = json.loads(cleaned_output)
+            parsed_output = parse_json_lenient(output)
+            if parsed_output is not None:
                 output = parsed_output
-            except json.JSONDecodeError:
-                pass
         
         # Create the validated output dictionary
         validated_output = {}
         
-        for field in expected_output.fields:
-            field_name = field.name
-            field_type = field.type.lower()
-            field_required = getattr(field, 'required', True)
+        for field_plan in self.output_plan:
+            field_name = field_plan.name
             
             # Try to extract the field value from output
             field_value = None
@@ -297,10 +553,10 @@ class AgentRuntime:
                 field_value = output.get(field_name)
             elif isinstance(output, str):
                 # For string outputs, try to extract structured data
-                field_value = self._extract_field_from_string(output, field_name, field_type)
+                field_value = self._extract_field_from_string(output, field_plan)
             
             # Handle missing required fields
-            if field_value is None and field_required:
+            if field_value is None and field_plan.required:
                 if isinstance(output, str):
                     # For required fields missing from string output, use the whole string
                     field_value = output
@@ -309,125 +565,47 @@ class AgentRuntime:
             
             # Type validation and conversion
             if field_value is not None:
-                field_value = self._convert_field_type(field_value, field_type, field_name)
+                field_value = field_plan.converter(field_value, field_name)
             
             validated_output[field_name] = field_value
         
         return validated_output
     
-    def _extract_field_from_string(self, text: str, field_name: str, field_type: str) -> Any:
-        """Extract field value from string output using patterns"""
-        
-        # Try JSON-like extraction first
-        json_pattern = rf'["\']?{re.escape(field_name)}["\']?\s*:\s*([^,\n\}}]+)'
-        match = re.search(json_pattern, text, re.IGNORECASE)
-        if match:
-            value = match.group(1).strip().strip('"\'')
-            # Clean up any remaining whitespace and newlines
-            value = value.strip().strip('\n\r\t')
-            return value
-        
-        # Try key-value pair extraction
-        kv_pattern = rf'{re.escape(field_name)}\s*[=:]\s*([^\n,]+)'
-        match = re.search(kv_pattern, text, re.IGNORECASE)
-        if match:
-            value = match.group(1).strip().strip('"\'')
-            # Clean up any remaining whitespace and newlines
-            value = value.strip().strip('\n\r\t')
-            return value
+    def _extract_field_from_string(self, text: str, field_plan: "_OutputFieldPlan") -> Any:
+        """Extract field value from string output using the field's precompiled patterns"""
+        
+        # Try JSON-like extraction first, then key-value pair extraction
+        for pattern in (field_plan.json_pattern, field_plan.kv_pattern):
+            match = pattern.search(text)
+            if match:
+                value = match.group(1).strip().strip('"\'')
+                # Clean up any remaining whitespace and newlines
+                value = value.strip().strip('\n\r\t')
+                return value
         
         # For specific field types, try specialized extraction
-        if field_type in ['number', 'integer', 'float']:
+        if field_plan.type in ['number', 'integer', 'float']:
             # Extract first number found
-            number_match = re.search(r'-?\d+\.?\d*', text)
+            number_match = _NUMBER_PATTERN.search(text)
             if number_match:
                 return number_match.group()
         
-        elif field_type == 'boolean':
+        elif field_plan.type == 'boolean':
             # Look for boolean indicators
-            if re.search(r'\b(true|yes|1)\b', text, re.IGNORECASE):
+            if _TRUE_PATTERN.search(text):
                 return True
-            elif re.search(r'\b(false|no|0)\b', text, re.IGNORECASE):
+            elif _FALSE_PATTERN.search(text):
                 return False
         
         return None
     
-    def _convert_field_type(self, value: Any, field_type: str, field_name: str) -> Any:
-        """Convert field value to expected type"""
-        
-        if field_type in ['string', 'str']:
-            return str(value)
-        
-        elif field_type in ['integer', 'int']:
-            try:
-                # Clean the value by stripping whitespace and newlines
-                cleaned_value = str(value).strip().strip('\n\r\t')
-                return int(float(cleaned_value))  # Handle "123.0" -> 123
-            except (ValueError, TypeError):
-                raise OutputValidationError(f"Cannot convert '{value}' to integer for field '{field_name}'")
-        
-        elif field_type in ['float', 'number']:
-            try:
-                # Clean the value by stripping whitespace and newlines
-                cleaned_value = str(value).strip().strip('\n\r\t')
-                return float(cleaned_value)
-            except (ValueError, TypeError):
-                raise OutputValidationError(f"Cannot convert '{value}' to float for field '{field_name}'")
-        
-        elif field_type in ['boolean', 'bool']:
-            if isinstance(value, bool):
-                return value
-            elif isinstance(value, str):
-                lower_val = value.lower().strip()
-                if lower_val in ['true', 'yes', '1', 'on']:
-                    return True
-                elif lower_val in ['false', 'no', '0', 'off']:
-                    return False
-                else:
-                    raise OutputValidationError(f"Cannot convert '{value}' to boolean for field '{field_name}'")
-            elif isinstance(value, (int, float)):
-                return bool(value)
-            else:
-                raise OutputValidationError(f"Cannot convert '{value}' to boolean for field '{field_name}'")
-        
-        elif field_type in ['list', 'array']:
-            if isinstance(value, list):
-                return value
-            elif isinstance(value, str):
-                try:
-                    # Try to parse as JSON array
-                    parsed = json.loads(value)
-                    if isinstance(parsed, list):
-                        return parsed
-                except json.JSONDecodeError:
-                    # Split by common delimiters
-                    return [item.strip() for item in re.split(r'[,;\n]', value) if item.strip()]
-            else:
-                return [value] 
-        
-        elif field_type in ['dict', 'object']:
-            if isinstance(value, dict):
-                return value
-            elif isinstance(value, str):
-                try:
-                    return json.loads(value)
-                except json.JSONDecodeError:
-                    # Return as single key-value pair
-                    return {"value": value}
-            else:
-                return {"value": value}
-        
-        else:
-            # Default: return as string
-            return str(value)
-    
-    def _format_output_with_llm(self, raw_output: str, max_retries: int = 2) -> Dict[str, Any]:
-        """Use LLM to format output according to OutputConfig schema"""
+    def _build_format_prompt(self, raw_output: str) -> str:
+        """Build the prompt used to ask the LLM to reformat raw agent output"""
         
         # Create schema description
         schema_description = self._create_output_schema_description()
         
-        format_prompt = f"""
+        return f"""
         You are a data formatter. Your task is to transform the following agent output into a structured JSON format that exactly matches the required schema.
 
         REQUIRED OUTPUT SCHEMA:
@@ -446,29 +624,54 @@ class AgentRuntime:
 
         JSON OUTPUT:"""
 
+    def _parse_formatted_response(self, formatted_text: str) -> Dict[str, Any]:
+        """Parse and validate the formatter LLM's response, raising on failure"""
+        # Extract JSON from response
+        formatted_output = parse_json_lenient(formatted_text)
+        if not isinstance(formatted_output, dict):
+            raise OutputValidationError("LLM failed to generate valid JSON format")
+        
+        return self._validate_output_structure(formatted_output)
+
+    def _format_output_with_llm(self, raw_output: str, max_retries: int = 2) -> Dict[str, Any]:
+        """Use LLM to format output according to OutputConfig schema"""
+        format_prompt = self._build_format_prompt(raw_output)
+
         for attempt in range(max_retries + 1):
             try:
                 # Updated to use invoke instead of predict
                 response = self.llm.invoke(format_prompt)
                 
-                formatted_text = response.content.strip()
-                
-                # Extract JSON from response
-                json_match = re.search(r'\{.*\}', formatted_text, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group()
-                    formatted_output = json.loads(json_str)
-
-                    return self._validate_output_structure(formatted_output)
-                else:
-                    if attempt == max_retries:
-                        raise OutputValidationError("LLM failed to generate valid JSON format")
-                    continue
+                validated_output = self._parse_formatted_response(response.content.strip())
+                self._count_output_path("llm_formatter")
+                return validated_output
                     
             except (json.JSONDecodeError, OutputValidationError) as e:
                 if attempt == max_retries:
                     # Last attempt failed, return basic structure
                     print(f"Warning: Output formatting failed after {max_retries + 1} attempts: {e}")
+                    self._count_output_path("fallback")
+                    return self._create_fallback_output(raw_output)
+                continue
+        
+        return self._create_fallback_output(raw_output)
+
+    async def _aformat_output_with_llm(self, raw_output: str, max_retries: int = 2) -> Dict[str, Any]:
+        """Async version of _format_output_with_llm"""
+        format_prompt = self._build_format_prompt(raw_output)
+
+        for attempt in range(max_retries + 1):
+            try:
+                response = await self.llm.ainvoke(format_prompt)
+                
+                validated_output = self._parse_formatted_response(response.content.strip())
+                self._count_output_path("llm_formatter")
+                return validated_output
+                    
+            except (json.JSONDecodeError, OutputValidationError) as e:
+                if attempt == max_retries:
+                    print(f"Warning: Output formatting failed after {max_retries + 1} attempts: {e}")
+                    self._count_output_path("fallback")
                     return self._create_fallback_output(raw_output)
                 continue
         
@@ -484,6 +687,36 @@ class AgentRuntime:
         
         return "\n".join(schema_parts)
     
+    def _create_final_answer_tool(self) -> DynamicLangChainTool:
+        """Create the terminal tool whose arguments are the agent's output fields, used for structured output mode"""
+        tool_config = ToolConfig(
+            name=FINAL_ANSWER_TOOL,
+            description=(
+                f"Submit the final output of {self.config.agent.name}. Call this once, as your last step, "
+                "with every output field filled in, instead of replying with plain text."
+            ),
+            inputs=ToolInputConfig(fields=self.config.agent.output.fields),
+            output=ToolOutputConfig(fields=self.config.agent.output.fields),
+            code_path="__builtin__",
+            function_name=FINAL_ANSWER_TOOL,
+        )
+        # return_direct ends the run right after the call, without another model turn
+        return DynamicLangChainTool(
+            tool_config,
+            builtin_function=lambda **fields: json.dumps(fields, default=str),
+            return_direct=True,
+        )
+    
+    def _count_output_path(self, path: str) -> None:
+        """Record how a run's output was produced (see get_output_stats)"""
+        with self._output_stats_lock:
+            self.output_stats[path] += 1
+    
+    def get_output_stats(self) -> Dict[str, int]:
+        """How often output came from direct validation, the LLM formatter, or the default fallback"""
+        with self._output_stats_lock:
+            return dict(self.output_stats)
+    
     def _create_fallback_output(self, raw_output: str) -> Dict[str, Any]:
         """Create a fallback output structure when validation fails"""
         fallback = {}
@@ -567,7 +800,7 @@ class AgentRuntime:
         Validate input data using Pydantic model
         """
         try:
-            InputModel = self._create_input_model()
+            InputModel = self.input_model
             
             # Handle array inputs
             validated_input = InputModel(**input_data)
@@ -583,39 +816,34 @@ class AgentRuntime:
             
             raise InputValidationError("; ".join(error_msgs))
         
-    def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Run the agent with validated dictionary input and enforce output structure
-        
-        Args:
-            input_data: Dictionary containing the input data matching agent's InputConfig
-            
-        Returns:
-            Dict containing the validated output matching the agent's OutputConfig
-        """
-        if self.agent is None:
-            raise Exception("Agent not properly initialized")
-        
-        try:
-            # Validate input using Pydantic
-            print(f"[INFO] Validating input data against schema")
-            validated_input = self._validate_input_data(input_data)
-            print(f"[INFO] Input validation successful")
-            
-            # Convert to query string for the agent
-            if "array_input" in validated_input:
-                input_summary = f"Array Input: {json.dumps(validated_input['array_input'], indent=2)}"
-            else:
-                input_summary = f"Input Data: {json.dumps(validated_input, indent=2)}"
+    def _build_query_string(self, validated_input: Dict[str, Any], context: List[str]) -> str:
+        """Build the agent prompt from validated input and retrieved context"""
+        # Convert to query string for the agent
+        if "array_input" in validated_input:
+            input_summary = f"Array Input: {json.dumps(validated_input['array_input'], indent=2)}"
+        else:
+            input_summary = f"Input Data: {json.dumps(validated_input, indent=2)}"
+
+        context_text = "\n".join(f"- {chunk}" for chunk in context)
+        if context_text:
+            context_text = f"Relevant context:\n{context_text}\n"
+
+        tool_names = self.get_tool_names()
+        if self.config.agent.output.structured_output:
+            # The run should end with the final_answer call, not a plain-text reply
+            tool_names = tool_names + [FINAL_ANSWER_TOOL]
+            answer_instructions = f"""4. Finish by calling the {FINAL_ANSWER_TOOL} tool with the output fields as its arguments:
+            {self._create_output_schema_description()}
+
+            Do not reply with plain text. Your last step must be the {FINAL_ANSWER_TOOL} call."""
+        else:
+            answer_instructions = f"""4. Format your final answer as a JSON matching the required output schema:
+            {self._create_output_schema_description()}
 
-            query_string = ""
-            context = self._get_context(str(input_data))
-            context_text = "\n".join(f"- {chunk}" for chunk in context)
-            if context_text:
-                context_text = f"Relevant context:\n{context_text}\n"
+            Provide your response in the required output format."""
 
-            # Build the query string
-            query_string = f"""
+        # Build the query string
+        return f"""
             Task: {self.config.agent.description}
 
             {input_summary}
@@ -623,7 +851,7 @@ class AgentRuntime:
             {context_text}
             
             Available Tools: 
-            {', '.join(self.get_tool_names())}
+            {', '.join(tool_names)}
 
             Tool Usage Instructions:
             - Use the available tools to gather information, perform calculations, or execute actions as needed
@@ -634,17 +862,162 @@ class AgentRuntime:
             1. Analyze the input data and determine what tools (if any) you need to use
             2. Use the tools to process the input and gather the necessary information
             3. Synthesize the results into a final answer based on the input data
-            4. Format your final answer as a JSON matching the required output schema:
-            {self._create_output_schema_description()}
-
-            Provide your response in the required output format.
+            {answer_instructions}
             """
+
+    def _record_event(self, event: Dict[str, Any], events: List, tool_calls: List, llm_calls: List) -> None:
+        """Collect analytics data from a single LangGraph stream event"""
+        events.append(event)
+        
+        # Extract tool call information
+        if 'agent' in event and 'messages' in event['agent']:
+            for message in event['agent']['messages']:
+                if hasattr(message, 'tool_calls') and message.tool_calls:
+                    for tool_call in message.tool_calls:
+                        tool_calls.append({
+                            'tool_name': tool_call['name'],
+                            'args': tool_call['args'],
+                            'call_id': tool_call['id'],
+                            'timestamp': time.time()
+                        })
+                
+                # Extract LLM usage data
+                if hasattr(message, 'response_metadata') and message.response_metadata:
+                    llm_calls.append({
+                        'model': message.response_metadata.get('model_name', 'unknown'),
+                        'tokens': message.response_metadata.get('token_usage', {}),
+                        'finish_reason': message.response_metadata.get('finish_reason', 'unknown'),
+                        'timestamp': time.time()
+                    })
+
+    def _build_run_analytics(self, input_data: Dict[str, Any], validated_input: Dict[str, Any], start_time: float,
+                             execution_time: float, events: List, tool_calls: List, llm_calls: List) -> Dict[str, Any]:
+        """Aggregate collected events into the standardized analytics record for a successful run"""
+        # Calculate comprehensive metrics
+        total_tokens = sum([call.get('tokens', {}).get('total_tokens', 0) for call in llm_calls])
+        prompt_tokens = sum([call.get('tokens', {}).get('prompt_tokens', 0) for call in llm_calls])
+        completion_tokens = sum([call.get('tokens', {}).get('completion_tokens', 0) for call in llm_calls])
+        
+        # Tool usage frequency
+        tool_usage_count = {}
+        for tc in tool_calls:
+            tool_usage_count[tc['tool_name']] = tool_usage_count.get(tc['tool_name'], 0) + 1
+        
+        # Create standardized analytics JSON with consistent schema
+        analytics_data = self._create_standardized_analytics(
+            input_data, validated_input, start_time, execution_time, 
+            events, tool_calls, llm_calls, total_tokens, prompt_tokens, 
+            completion_tokens, tool_usage_count, success=True, error_message=None
+        )
+        
+        print(f"[ANALYTICS_JSON] {json.dumps(analytics_data, indent=2)}")
+        return analytics_data
+
+    def _publish_analytics(self, analytics_records: List[Dict[str, Any]]) -> None:
+        """Upload analytics records to Databricks; failures are logged and never affect the run result"""
+        agent_name = self.config.agent.name
+        try:
+            # Imported here so the Databricks SDK is only loaded when analytics are published
+            from .blackbox import upload_agent_data_to_databricks
+            
+            # Records are passed in memory: a shared file would be overwritten by concurrent runs
+            success = upload_agent_data_to_databricks(agent_name, analytics_records, f"default.{agent_name}")
+            print(f"Upload successful: {success}")
+        except Exception as e:
+            print(f"[ERROR] Failed to publish analytics for {agent_name}: {str(e)}")
+
+    def _extract_raw_result(self, result: Dict[str, Any]) -> Any:
+        """Extract the final message content (or final_answer fields) from a LangGraph response"""
+        raw_result = None
+        
+        # Try different possible structures for LangGraph response
+        final_answer = self._extract_final_answer(result)
+        if final_answer is not None:
+            # Structured output mode: {'tools': {'messages': [ToolMessage(name='final_answer', ...)]}}
+            raw_result = final_answer
+        elif "agent" in result and "messages" in result["agent"] and result["agent"]["messages"]:
+            # Structure: {'agent': {'messages': [...]}}
+            last_message = result["agent"]["messages"][-1]
+            if hasattr(last_message, 'content'):
+                raw_result = last_message.content
+            else:
+                raw_result = str(last_message)
+        elif "messages" in result and result["messages"]:
+            # Structure: {'messages': [...]}
+            last_message = result["messages"][-1]
+            if hasattr(last_message, 'content'):
+                raw_result = last_message.content
+            else:
+                raw_result = str(last_message)
+        else:
+            # Fallback: convert entire result to string
+            raw_result = str(result)
+        
+        print(f"[INFO] Agent raw output: {raw_result}")
+        return raw_result
+
+    def _extract_final_answer(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Output fields passed to the final_answer tool, if the run ended with that call"""
+        if "tools" not in result or not result["tools"].get("messages"):
+            return None
+        for message in result["tools"]["messages"]:
+            if getattr(message, 'name', None) == FINAL_ANSWER_TOOL:
+                try:
+                    return json.loads(message.content)
+                except (TypeError, json.JSONDecodeError):
+                    return None
+        return None
+
+    def _start_thread(self, session_id: Optional[str]) -> Tuple[Dict[str, Any], str]:
+        """Return the LangGraph config and thread id for a run, one fresh thread per run without a session"""
+        thread_id = session_id if session_id is not None else f"run-{uuid.uuid4().hex}"
+        # max_concurrency sizes the thread pool the tool node fans parallel tool calls out to
+        config = {"configurable": {"thread_id": thread_id}, "max_concurrency": self.config.agent.max_tool_concurrency}
+        return config, thread_id
+
+    def _end_thread(self, thread_id: str, session_id: Optional[str]) -> None:
+        """Drop the checkpoint of a one-off run; session threads are kept for the next turn"""
+        if session_id is None and self.memory is not None:
+            self.memory.delete_thread(thread_id)
+
+    def reset_session(self, session_id: str) -> None:
+        """Forget the conversation history stored for session_id"""
+        if self.memory is not None:
+            self.memory.delete_thread(session_id)
+
+    def run(self, input_data: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run the agent with validated dictionary input and enforce output structure
+        
+        Args:
+            input_data: Dictionary containing the input data matching agent's InputConfig
+            session_id: Optional conversation id; runs sharing it see each other's history.
+                        Without it every run starts from an empty conversation.
+            
+        Returns:
+            Dict containing the validated output matching the agent's OutputConfig
+        """
+        if self.agent is None:
+            raise Exception("Agent not properly initialized")
+        
+        context_future = None
+        try:
+            # Retrieval only needs the raw input, so it runs while the input is validated
+            context_future = self._start_context(input_data)
+            
+            # Validate input using Pydantic
+            print(f"[INFO] Validating input data against schema")
+            validated_input = self._validate_input_data(input_data)
+            print(f"[INFO] Input validation successful")
+            
+            context = self._finish_context(context_future)
+            query_string = self._build_query_string(validated_input, context)
             
             print(f"[INFO] Running agent with validated input")
             print(f"[INFO] Available tools: {self.get_tool_names()}")
             
             # Run the agent using LangGraph's stream method for event tracking
-            config = {"configurable": {"thread_id": "main"}}
+            config, thread_id = self._start_thread(session_id)
             
             # Collect analytics data during execution
             start_time = time.time()
@@ -653,88 +1026,30 @@ class AgentRuntime:
             llm_calls = []
             
             # Stream events for comprehensive analytics
-            for event in self.agent.stream(
-                {"messages": [("human", query_string)]},
-                config=config
-            ):
-                events.append(event)
-                
-                # Extract tool call information
-                if 'agent' in event and 'messages' in event['agent']:
-                    for message in event['agent']['messages']:
-                        if hasattr(message, 'tool_calls') and message.tool_calls:
-                            for tool_call in message.tool_calls:
-                                tool_calls.append({
-                                    'tool_name': tool_call['name'],
-                                    'args': tool_call['args'],
-                                    'call_id': tool_call['id'],
-                                    'timestamp': time.time()
-                                })
-                        
-                        # Extract LLM usage data
-                        if hasattr(message, 'response_metadata') and message.response_metadata:
-                            llm_calls.append({
-                                'model': message.response_metadata.get('model_name', 'unknown'),
-                                'tokens': message.response_metadata.get('token_usage', {}),
-                                'finish_reason': message.response_metadata.get('finish_reason', 'unknown'),
-                                'timestamp': time.time()
-                            })
+            try:
+                for event in self.agent.stream(
+                    {"messages": [("human", query_string)]},
+                    config=config
+                ):
+                    self._record_event(event, events, tool_calls, llm_calls)
+            finally:
+                self._end_thread(thread_id, session_id)
             
             execution_time = time.time() - start_time
             
-            # Get the final result from the last event
-            result = events[-1] if events else {}
-            
-            # Calculate comprehensive metrics
-            total_tokens = sum([call.get('tokens', {}).get('total_tokens', 0) for call in llm_calls])
-            prompt_tokens = sum([call.get('tokens', {}).get('prompt_tokens', 0) for call in llm_calls])
-            completion_tokens = sum([call.get('tokens', {}).get('completion_tokens', 0) for call in llm_calls])
-            
-            # Tool usage frequency
-            tool_usage_count = {}
-            for tc in tool_calls:
-                tool_usage_count[tc['tool_name']] = tool_usage_count.get(tc['tool_name'], 0) + 1
-            
-            # Create standardized analytics JSON with consistent schema
-            analytics_data = self._create_standardized_analytics(
-                input_data, validated_input, start_time, execution_time, 
-                events, tool_calls, llm_calls, total_tokens, prompt_tokens, 
-                completion_tokens, tool_usage_count, success=True, error_message=None
+            analytics_data = self._build_run_analytics(
+                input_data, validated_input, start_time, execution_time, events, tool_calls, llm_calls
             )
-            
-            print(f"[ANALYTICS_JSON] {json.dumps(analytics_data, indent=2)}")
-            with open(f"{self.config.agent.name}_output_json.json", "w") as f:
-                json.dump([analytics_data], f)
-            test_local(self.config.agent.name, f"{self.config.agent.name}")
+            self._publish_analytics([analytics_data])
 
-            # Extract the final message content from LangGraph response
-            raw_result = None
-            
-            # Try different possible structures for LangGraph response
-            if "agent" in result and "messages" in result["agent"] and result["agent"]["messages"]:
-                # Structure: {'agent': {'messages': [...]}}
-                last_message = result["agent"]["messages"][-1]
-                if hasattr(last_message, 'content'):
-                    raw_result = last_message.content
-                else:
-                    raw_result = str(last_message)
-            elif "messages" in result and result["messages"]:
-                # Structure: {'messages': [...]}
-                last_message = result["messages"][-1]
-                if hasattr(last_message, 'content'):
-                    raw_result = last_message.content
-                else:
-                    raw_result = str(last_message)
-            else:
-                # Fallback: convert entire result to string
-                raw_result = str(result)
-            
-            print(f"[INFO] Agent raw output: {raw_result}")
+            # Get the final result from the last event
+            raw_result = self._extract_raw_result(events[-1] if events else {})
             
             # Validate and format the output (using existing methods)
             try:
                 validated_output = self._validate_output_structure(raw_result)
                 print(f"[INFO] Direct validation successful")
+                self._count_output_path("direct")
                 return validated_output
             except OutputValidationError as e:
                 print(f"[INFO] Direct validation failed: {e}. Attempting LLM-assisted formatting...")
@@ -743,16 +1058,307 @@ class AgentRuntime:
                 return validated_output
                     
         except InputValidationError as e:
+            # Free the retrieval thread if the search hasn't started yet
+            if context_future is not None:
+                context_future.cancel()
             print(f"[ERROR] Input validation failed: {str(e)}")
             # Log analytics for failed runs
             self._log_failed_analytics(input_data, str(e), "input_validation_error")
             return self._create_fallback_output(f"Input validation error: {str(e)}")
             
         except Exception as e:
+            if context_future is not None:
+                context_future.cancel()
             print(f"[ERROR] Agent execution failed: {str(e)}")
             # Log analytics for failed runs
             self._log_failed_analytics(input_data, str(e), "execution_error")
             return self._create_fallback_output(f"Error: {str(e)}")
+
+    async def astream(self, input_data: Dict[str, Any], session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream LangGraph events for a run without blocking the event loop
+        
+        Unlike run(), input validation errors are raised to the caller.
+        
+        Args:
+            input_data: Dictionary containing the input data matching agent's InputConfig
+            session_id: Optional conversation id, see run()
+            
+        Yields:
+            LangGraph update events as they are produced by the agent graph
+        """
+        if self.agent is None:
+            raise Exception("Agent not properly initialized")
+        
+        context_future = self._astart_context(input_data)
+        try:
+            validated_input = self._validate_input_data(input_data)
+        except BaseException:
+            self._cancel_context(context_future)
+            raise
+        context = await self._afinish_context(context_future)
+        query_string = self._build_query_string(validated_input, context)
+        
+        config, thread_id = self._start_thread(session_id)
+        
+        try:
+            async for event in self.agent.astream(
+                {"messages": [("human", query_string)]},
+                config=config
+            ):
+                yield event
+        finally:
+            self._end_thread(thread_id, session_id)
+
+    async def astream_output(self, input_data: Dict[str, Any], session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a run as typed events while it executes
+        
+        Yields dictionaries with a 'type' key:
+            token        partial model output as it is generated ('content')
+            tool_call    the model requested a tool ('tool_name', 'args', 'call_id')
+            tool_result  a tool finished ('tool_name', 'call_id', 'content')
+            final        the validated output ('output'), always the last event on success
+            error        the run failed ('error_type', 'message')
+        
+        Args:
+            input_data: Dictionary containing the input data matching agent's InputConfig
+            session_id: Optional conversation id, see run()
+        """
+        if self.agent is None:
+            raise Exception("Agent not properly initialized")
+        
+        context_future = self._astart_context(input_data)
+        try:
+            validated_input = self._validate_input_data(input_data)
+        except InputValidationError as e:
+            self._cancel_context(context_future)
+            print(f"[ERROR] Input validation failed: {str(e)}")
+            self._log_failed_analytics(input_data, str(e), "input_validation_error")
+            yield {"type": "error", "error_type": "input_validation_error", "message": str(e)}
+            return
+        
+        try:
+            context = await self._afinish_context(context_future)
+            query_string = self._build_query_string(validated_input, context)
+            
+            config, thread_id = self._start_thread(session_id)
+            
+            start_time = time.time()
+            events = []
+            tool_calls = []
+            llm_calls = []
+            
+            try:
+                async for mode, chunk in self.agent.astream(
+                    {"messages": [("human", query_string)]},
+                    config=config,
+                    stream_mode=["updates", "messages"]
+                ):
+                    if mode == "messages":
+                        message, metadata = chunk
+                        # Only stream tokens produced by the agent node, not tool output
+                        if metadata.get("langgraph_node") == "agent" and isinstance(message, AIMessageChunk):
+                            if isinstance(message.content, str) and message.content:
+                                yield {"type": "token", "content": message.content}
+                        continue
+                    
+                    recorded_calls = len(tool_calls)
+                    self._record_event(chunk, events, tool_calls, llm_calls)
+                    for tool_call in tool_calls[recorded_calls:]:
+                        yield {
+                            "type": "tool_call",
+                            "tool_name": tool_call['tool_name'],
+                            "args": tool_call['args'],
+                            "call_id": tool_call['call_id'],
+                        }
+                    
+                    if 'tools' in chunk and 'messages' in chunk['tools']:
+                        for message in chunk['tools']['messages']:
+                            yield {
+                                "type": "tool_result",
+                                "tool_name": getattr(message, 'name', None),
+                                "call_id": getattr(message, 'tool_call_id', None),
+                                "content": message.content,
+                            }
+            finally:
+                self._end_thread(thread_id, session_id)
+            
+            execution_time = time.time() - start_time
+            
+            analytics_data = self._build_run_analytics(
+                input_data, validated_input, start_time, execution_time, events, tool_calls, llm_calls
+            )
+            await asyncio.to_thread(self._publish_analytics, [analytics_data])
+            
+            raw_result = self._extract_raw_result(events[-1] if events else {})
+            
+            try:
+                validated_output = self._validate_output_structure(raw_result)
+                self._count_output_path("direct")
+            except OutputValidationError as e:
+                print(f"[INFO] Direct validation failed: {e}. Attempting LLM-assisted formatting...")
+                validated_output = await self._aformat_output_with_llm(str(raw_result))
+            
+            yield {"type": "final", "output": validated_output}
+        
+        except Exception as e:
+            print(f"[ERROR] Agent execution failed: {str(e)}")
+            self._log_failed_analytics(input_data, str(e), "execution_error")
+            yield {"type": "error", "error_type": "execution_error", "message": str(e)}
+
+    async def _aexecute(self, input_data: Dict[str, Any], session_id: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Execute one run asynchronously and return its validated output and analytics record
+        
+        Errors are raised to the caller; publishing analytics is left to the caller so
+        batches can write them once.
+        """
+        context_future = self._astart_context(input_data)
+        
+        print(f"[INFO] Validating input data against schema")
+        try:
+            validated_input = self._validate_input_data(input_data)
+        except BaseException:
+            self._cancel_context(context_future)
+            raise
+        print(f"[INFO] Input validation successful")
+        
+        context = await self._afinish_context(context_future)
+        query_string = self._build_query_string(validated_input, context)
+        
+        print(f"[INFO] Running agent with validated input")
+        
+        config, thread_id = self._start_thread(session_id)
+        
+        start_time = time.time()
+        events = []
+        tool_calls = []
+        llm_calls = []
+        
+        try:
+            async for event in self.agent.astream(
+                {"messages": [("human", query_string)]},
+                config=config
+            ):
+                self._record_event(event, events, tool_calls, llm_calls)
+        finally:
+            self._end_thread(thread_id, session_id)
+        
+        execution_time = time.time() - start_time
+        
+        analytics_data = self._build_run_analytics(
+            input_data, validated_input, start_time, execution_time, events, tool_calls, llm_calls
+        )
+
+        raw_result = self._extract_raw_result(events[-1] if events else {})
+        
+        try:
+            validated_output = self._validate_output_structure(raw_result)
+            print(f"[INFO] Direct validation successful")
+            self._count_output_path("direct")
+        except OutputValidationError as e:
+            print(f"[INFO] Direct validation failed: {e}. Attempting LLM-assisted formatting...")
+            validated_output = await self._aformat_output_with_llm(str(raw_result))
+            print(f"[INFO] LLM-assisted validation successful")
+        
+        return validated_output, analytics_data
+
+    async def arun(self, input_data: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async version of run(): retrieval, LLM calls, tool calls and the analytics
+        upload are awaited instead of blocking, so many runs can share one event loop
+        
+        Args:
+            input_data: Dictionary containing the input data matching agent's InputConfig
+            session_id: Optional conversation id, see run()
+            
+        Returns:
+            Dict containing the validated output matching the agent's OutputConfig
+        """
+        if self.agent is None:
+            raise Exception("Agent not properly initialized")
+        
+        try:
+            validated_output, analytics_data = await self._aexecute(input_data, session_id=session_id)
+            # The Databricks SDK is synchronous, keep it off the event loop
+            await asyncio.to_thread(self._publish_analytics, [analytics_data])
+            return validated_output
+                    
+        except InputValidationError as e:
+            print(f"[ERROR] Input validation failed: {str(e)}")
+            self._log_failed_analytics(input_data, str(e), "input_validation_error")
+            return self._create_fallback_output(f"Input validation error: {str(e)}")
+            
+        except Exception as e:
+            print(f"[ERROR] Agent execution failed: {str(e)}")
+            self._log_failed_analytics(input_data, str(e), "execution_error")
+            return self._create_fallback_output(f"Error: {str(e)}")
+
+    async def arun_batch(self, inputs: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Run the agent over many inputs concurrently, at most max_concurrency at a time
+        
+        The LLM client, tools and input model of this runtime are shared by every item.
+        Analytics for the whole batch are written and uploaded once at the end.
+        
+        Args:
+            inputs: List of input dictionaries matching agent's InputConfig
+            max_concurrency: Maximum number of items in flight at once
+            
+        Returns:
+            One result per input, in input order, each with keys
+            'index', 'success', 'output' and 'error'
+        """
+        if self.agent is None:
+            raise Exception("Agent not properly initialized")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_item(index: int, input_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+            # Each item runs on its own one-off conversation thread
+            async with semaphore:
+                try:
+                    validated_output, analytics_data = await self._aexecute(input_data)
+                    result = {"index": index, "success": True, "output": validated_output, "error": None}
+                    return result, analytics_data
+                except InputValidationError as e:
+                    print(f"[ERROR] Batch item {index} input validation failed: {str(e)}")
+                    analytics_data = self._log_failed_analytics(input_data, str(e), "input_validation_error")
+                    output = self._create_fallback_output(f"Input validation error: {str(e)}")
+                except Exception as e:
+                    print(f"[ERROR] Batch item {index} execution failed: {str(e)}")
+                    analytics_data = self._log_failed_analytics(input_data, str(e), "execution_error")
+                    output = self._create_fallback_output(f"Error: {str(e)}")
+                
+                return {"index": index, "success": False, "output": output, "error": analytics_data["error_message"]}, analytics_data
+        
+        item_results = await asyncio.gather(*(run_item(i, item) for i, item in enumerate(inputs)))
+        
+        results = [result for result, _ in item_results]
+        analytics_records = [analytics for _, analytics in item_results]
+        
+        if analytics_records:
+            await asyncio.to_thread(self._publish_analytics, analytics_records)
+        
+        succeeded = sum(1 for result in results if result["success"])
+        print(f"[INFO] Batch finished: {succeeded}/{len(results)} items succeeded")
+        return results
+
+    def run_batch(self, inputs: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Synchronous entry point for arun_batch; use arun_batch from inside a running event loop
+        """
+        async def run_and_close() -> List[Dict[str, Any]]:
+            try:
+                return await self.arun_batch(inputs, max_concurrency=max_concurrency)
+            finally:
+                # The HTTP client belongs to this throwaway loop, close it with the loop
+                await aclose_http_client()
+        
+        return asyncio.run(run_and_close())
     
     def validate_configuration(self) -> List[str]:
         """
@@ -779,7 +1385,7 @@ class AgentRuntime:
         
         return issues
     
-    def _log_failed_analytics(self, input_data: Dict[str, Any], error_message: str, error_type: str):
+    def _log_failed_analytics(self, input_data: Dict[str, Any], error_message: str, error_type: str) -> Dict[str, Any]:
         """Log analytics for failed agent runs using standardized schema"""
         current_time = time.time()
         
@@ -796,6 +1402,7 @@ class AgentRuntime:
         )
         
         # print(f"[ANALYTICS_JSON] {json.dumps(failed_analytics, indent=2)}")
+        return failed_analytics
     
     def _create_standardized_analytics(self, input_data: Dict[str, Any], validated_input: Dict[str, Any], 
                                      start_time: float, execution_time: float, events: List, tool_calls: List, 
@@ -0,0 +1,152 @@
+import email.utils
+import json
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .agent_models import RetryConfig
+
+# HTTP methods that can safely be sent again
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker shared by every API tool and run in the process.
+
+    After failure_threshold consecutive failures the circuit opens and calls fail
+    fast for reset_timeout_seconds. Then one trial call is let through (half-open):
+    success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+                return "half-open"
+            return "open"
+
+    def before_call(self) -> Optional[float]:
+        """None if the call may proceed, otherwise the seconds until the circuit allows a trial"""
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            remaining = self.reset_timeout_seconds - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                return remaining
+            if self._trial_in_flight:
+                # Only one probe at a time while half-open
+                return self.reset_timeout_seconds
+            self._trial_in_flight = True
+            return None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give up a call that ended without a result (e.g. cancelled), so the next call can probe"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+# (host, failure threshold, reset seconds) -> breaker
+_breakers: Dict[Tuple[str, int, float], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(url: str, retry_config: RetryConfig) -> CircuitBreaker:
+    """
+    Return the circuit breaker of the host url points at, creating it on first use.
+
+    APIs on the same host share a breaker only when their circuit settings match, so
+    each one trips and recovers the way its own config says.
+    """
+    key = (
+        urlsplit(url).netloc.lower(),
+        retry_config.circuit_failure_threshold,
+        retry_config.circuit_reset_seconds,
+    )
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=retry_config.circuit_failure_threshold,
+                reset_timeout_seconds=retry_config.circuit_reset_seconds,
+            )
+            _breakers[key] = breaker
+        return breaker
+
+
+def circuit_open_error(url: str, retry_in: float) -> str:
+    """Fail-fast tool result; the leading 'API Error' keeps it out of result caches"""
+    details = {
+        "error": "circuit_open",
+        "host": urlsplit(url).netloc,
+        "retry_after_seconds": round(retry_in, 1),
+        "message": "Upstream is failing, call skipped. Do not retry this tool right away.",
+    }
+    return f"API Error (circuit open): {json.dumps(details)}"
+
+
+def max_attempts(method: str, retry_config: RetryConfig) -> int:
+    return retry_config.max_attempts if method.upper() in IDEMPOTENT_METHODS else 1
+
+
+def is_retryable_status(status_code: int, retry_config: RetryConfig) -> bool:
+    return status_code in retry_config.retry_on_status
+
+
+def counts_as_failure(status_code: int) -> bool:
+    """Server errors trip the breaker; 4xx (including 429) mean the host is up"""
+    return status_code >= 500
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def retry_delay(attempt: int, retry_config: RetryConfig, retry_after: Optional[str] = None) -> Optional[float]:
+    """
+    Seconds to wait before retry number attempt + 1, or None if it should not happen.
+
+    A Retry-After header is honoured when present, unless it asks for longer than
+    max_retry_after_seconds. Otherwise the delay is exponential with full jitter, so
+    concurrent runs don't retry in lockstep.
+    """
+    requested = _parse_retry_after(retry_after)
+    if requested is not None:
+        return requested if requested <= retry_config.max_retry_after_seconds else None
+
+    ceiling = min(retry_config.backoff_max_seconds, retry_config.backoff_base_seconds * 2 ** attempt)
+    return random.uniform(0, ceiling)
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+current_dir = Path(__file__).resolve().parent
+
+# Directory for on-disk caches, next to .langsketch-credentials.json by default
+CACHE_DIR = Path(os.environ.get("LANGSKETCH_CACHE_DIR", current_dir.parent / ".langsketch-cache"))
+
+
+class DiskCache:
+    """
+    Persistent key/value store backed by a SQLite file.
+
+    Values must be JSON serializable. The file can be shared by several processes,
+    and entries expire after ttl_seconds (None means they never expire).
+    """
+
+    def __init__(self, namespace: str, path: Optional[Path] = None, ttl_seconds: Optional[float] = None):
+        self.namespace = namespace
+        self.path = Path(path) if path is not None else CACHE_DIR / "cache.sqlite3"
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS cache ("
+                        "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                        "expires_at REAL, PRIMARY KEY (namespace, key))"
+                    )
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if it is missing or expired"""
+        if not self.path.exists():
+            return None
+
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.time() + ttl if ttl is not None else None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires_at)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def delete(self, key: str) -> None:
+        if not self.path.exists():
+            return
+
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def clear(self) -> None:
+        """Remove every entry in this namespace"""
+        if not self.path.exists():
+            return
+
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after ttl_seconds.
+
+    When a DiskCache is given it acts as a shared second level: misses fall through
+    to it and writes go to both, so several workers can share results.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 300, disk: Optional[DiskCache] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = disk
+        # key -> (value, expires_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def _store(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key: str, value: Any) -> None:
+        self._store(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl_seconds=self.ttl_seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str, max_entries: int = 1024, ttl_seconds: Optional[float] = 300, persist: bool = False) -> TTLCache:
+    """
+    Return the process-wide TTLCache for namespace, creating it on first use.
+
+    The size and TTL given by the first caller win. With persist=True the cache is
+    backed by the shared on-disk store under the same namespace.
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            disk = DiskCache(namespace, ttl_seconds=ttl_seconds) if persist else None
+            cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds, disk=disk)
+            _caches[namespace] = cache
+        return cache
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class _Call:
+    """One in-flight sync execution that later callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one execution.
+
+    The first caller for a key runs the function; callers arriving with the same key
+    while it is in flight wait and receive its result (or exception). Nothing is kept
+    once the call finishes, so this is not a cache: a later call runs again.
+
+    Async calls are grouped per event loop, since a task can only be awaited on its own loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def do(self, key: str, function: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    async def ado(self, key: str, function: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            if task is None:
+                task = loop.create_task(function())
+                tasks[key] = task
+                task.add_done_callback(lambda _, tasks=tasks: self._forget(tasks, key, task))
+        # Shielded so one caller being cancelled doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, tasks: Dict[str, asyncio.Task], key: str, task: asyncio.Task) -> None:
+        with self._lock:
+            if tasks.get(key) is task:
+                del tasks[key]
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_singleflight(namespace: str) -> SingleFlight:
+    """Return the process-wide SingleFlight for namespace, so identical calls coalesce across agents"""
+    with _groups_lock:
+        group = _groups.get(namespace)
+        if group is None:
+            group = SingleFlight()
+            _groups[namespace] = group
+        return group
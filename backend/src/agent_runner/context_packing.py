@@ -0,0 +1,101 @@
+import math
+import re
+from typing import List, Set
+
+_WORD_PATTERN = re.compile(r"\w+")
+_SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+# Rough size of one token in characters for English text with OpenAI-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, good enough for budgeting prompt context"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _word_set(text: str) -> Set[str]:
+    return set(_WORD_PATTERN.findall(text.lower()))
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def truncate_to_sentences(text: str, max_tokens: int) -> str:
+    """
+    Keep the leading whole sentences of text that fit in max_tokens.
+
+    If not even the first sentence fits (tables, code and extracted PDF text often
+    have no terminators), the text is cut at a word boundary and marked with "...".
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    text = text.strip()
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_END_PATTERN.split(text):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept)
+
+    # One token is kept for the marker
+    limit = (max_tokens - 1) * CHARS_PER_TOKEN
+    if limit <= 0:
+        return ""
+    cut = text[:limit]
+    boundary = max(cut.rfind(" "), cut.rfind("\n"), cut.rfind("\t"))
+    if boundary > 0 and not text[limit:limit + 1].isspace():
+        cut = cut[:boundary]
+    return cut.rstrip() + "..."
+
+
+def pack_context(chunks: List[str], max_tokens: int, diversity: float = 0.3,
+                 duplicate_threshold: float = 0.8) -> List[str]:
+    """
+    Select and trim retrieved chunks so they fit in a token budget.
+
+    chunks are expected in relevance order. They are picked with maximal marginal
+    relevance: relevance by rank, penalized by word overlap with chunks already
+    picked (weighted by diversity). Chunks overlapping a picked one by at least
+    duplicate_threshold are dropped, and the last chunk that does not fit whole is
+    cut at a sentence boundary (or a word boundary if it has none).
+    """
+    candidates = [(rank, chunk, _word_set(chunk)) for rank, chunk in enumerate(chunks) if chunk and chunk.strip()]
+    total = len(candidates)
+    selected = []
+    remaining = max_tokens
+
+    while candidates and remaining > 0:
+        best_index = None
+        best_score = None
+        for i, (rank, _, words) in enumerate(candidates):
+            relevance = 1.0 - rank / total
+            redundancy = max((_similarity(words, picked_words) for _, _, picked_words in selected), default=0.0)
+            score = (1.0 - diversity) * relevance - diversity * redundancy
+            if best_score is None or score > best_score:
+                best_index, best_score = i, score
+
+        rank, chunk, words = candidates.pop(best_index)
+        if any(_similarity(words, picked_words) >= duplicate_threshold for _, _, picked_words in selected):
+            continue
+
+        cost = estimate_tokens(chunk)
+        if cost > remaining:
+            chunk = truncate_to_sentences(chunk, remaining)
+            if not chunk:
+                continue
+            cost = estimate_tokens(chunk)
+
+        selected.append((rank, chunk, words))
+        remaining -= cost
+
+    # Present the survivors in their original relevance order
+    return [chunk for _, chunk, _ in sorted(selected, key=lambda item: item[0])]
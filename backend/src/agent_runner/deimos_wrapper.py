@@ -36,10 +36,28 @@ class DeimosCompatibleChatOpenAI(ChatOpenAI):
             messages = self._convert_messages_for_deimos(messages)
         return super().invoke(messages, *args, **kwargs)
     
+    async def ainvoke(self, messages, *args, **kwargs):
+        if isinstance(messages, list):
+            messages = self._convert_messages_for_deimos(messages)
+        return await super().ainvoke(messages, *args, **kwargs)
+    
     def _generate(self, messages, *args, **kwargs):
         messages = self._convert_messages_for_deimos(messages)
         return super()._generate(messages, *args, **kwargs)
     
+    async def _agenerate(self, messages, *args, **kwargs):
+        messages = self._convert_messages_for_deimos(messages)
+        return await super()._agenerate(messages, *args, **kwargs)
+    
+    def _stream(self, messages, *args, **kwargs):
+        messages = self._convert_messages_for_deimos(messages)
+        return super()._stream(messages, *args, **kwargs)
+    
+    async def _astream(self, messages, *args, **kwargs):
+        messages = self._convert_messages_for_deimos(messages)
+        async for chunk in super()._astream(messages, *args, **kwargs):
+            yield chunk
+    
     def _call(self, messages, *args, **kwargs):
         messages = self._convert_messages_for_deimos(messages)
         return super()._call(messages, *args, **kwargs)
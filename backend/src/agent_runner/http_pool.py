@@ -0,0 +1,89 @@
+import asyncio
+import http.cookiejar
+import os
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Keep-alive connections kept per host, shared by every API tool in the process
+HTTP_POOL_SIZE_PER_HOST = int(os.environ.get("LANGSKETCH_HTTP_POOL_SIZE", "20"))
+# Number of distinct hosts whose pools are kept open
+HTTP_POOL_HOSTS = int(os.environ.get("LANGSKETCH_HTTP_POOL_HOSTS", "32"))
+# Upper bound on simultaneous connections of one async client (httpx limits are per client)
+HTTP_MAX_CONNECTIONS = int(os.environ.get("LANGSKETCH_HTTP_MAX_CONNECTIONS", "100"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+# One AsyncClient per event loop, since httpx connections are bound to the loop that opened them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def _no_cookie_policy() -> http.cookiejar.CookiePolicy:
+    # The clients are shared by every agent, so a cookie set for one must never be sent for another
+    return http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+
+
+def get_http_session() -> requests.Session:
+    """
+    Return the process-wide requests.Session used for synchronous API calls.
+
+    Connections are kept alive and reused per host, so repeated calls to the same API
+    skip the TCP and TLS handshakes. When all connections to a host are busy, callers
+    wait for one instead of opening more. Cookies are never stored.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.cookies.set_policy(_no_cookie_policy())
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_HOSTS,
+                pool_maxsize=HTTP_POOL_SIZE_PER_HOST,
+                pool_block=True,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the pooled httpx.AsyncClient of the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                # Match requests, which follows redirects, so sync and async runs see the same payload
+                follow_redirects=True,
+                cookies=http.cookiejar.CookieJar(policy=_no_cookie_policy()),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_POOL_SIZE_PER_HOST,
+                ),
+            )
+            _async_clients[loop] = client
+        return client
+
+
+def close_http_session() -> None:
+    """Close the synchronous session; the next call to get_http_session opens a new one"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+async def aclose_http_client() -> None:
+    """Close the async client of the running event loop, e.g. on application shutdown"""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,312 @@
+import asyncio
+import codecs
+import hashlib
+import re
+import threading
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from .agent_models import RAGConfig
+from .caching import DiskCache
+from .runtime_context import get_runtime_context
+
+# Chunks sent to the index per upsert call
+INGEST_BATCH_SIZE = 64
+# Batches allowed to wait for the index before extraction pauses
+INGEST_MAX_PENDING_BATCHES = 4
+# Bytes of a text file decoded at a time
+TEXT_BLOCK_SIZE = 64 * 1024
+# Average and maximum segment length in chunks, see iter_chunks
+SEGMENT_TARGET_CHUNKS = 4
+SEGMENT_MAX_CHUNKS = 16
+
+# A unit (see iter_chunks) ends after a line break or a sentence end, with the whitespace that follows
+_UNIT_END_PATTERN = re.compile(r"\n\s*|[.!?]\s+")
+
+# "<index name>|<document id>" -> ids of the chunks currently indexed for that document
+_manifests = DiskCache("document_manifests")
+
+
+def open_index(rag_config: RAGConfig):
+    """Return the vector index a RAG config points at (local or Databricks)"""
+    if rag_config.provider == "local":
+        # Imported here so numpy is only loaded for agents with a local index
+        from .local_index import get_local_index
+
+        return get_local_index(rag_config)
+
+    client = get_runtime_context().vector_search_client
+    return client.get_index(endpoint_name=rag_config.endpoint, index_name=rag_config.index_name)
+
+
+def _make_splitter(chunk_size: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=min(200, chunk_size // 4),
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""],
+    )
+
+
+def _iter_pdf_pages(file: BinaryIO) -> Iterator[str]:
+    from PyPDF2 import PdfReader
+
+    # PdfReader parses pages lazily, so only one page of text is held at a time
+    reader = PdfReader(file)
+    for page in reader.pages:
+        # Pages are concatenated as-is by iter_chunks, so end each one with a line break
+        yield (page.extract_text() or "") + "\n"
+
+
+def _iter_text_blocks(file: BinaryIO) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        block = file.read(TEXT_BLOCK_SIZE)
+        if not block:
+            break
+        yield decoder.decode(block)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_document_pages(file: BinaryIO, filename: str, content_type: str = "") -> Iterator[str]:
+    """
+    Yield the text of a PDF page by page, or of a text/markdown file block by block.
+
+    Joining the pieces gives the document text; blocks of text files may end anywhere,
+    even mid-word.
+    """
+    if filename.lower().endswith(".pdf"):
+        return _iter_pdf_pages(file)
+    if filename.lower().endswith(".md") or (content_type or "").startswith("text/"):
+        return _iter_text_blocks(file)
+    raise ValueError("Unsupported file type")
+
+
+def _is_segment_boundary(unit: str, chunk_size: int) -> bool:
+    """
+    Content-defined cut point: decided by the unit's own hash, so an edit elsewhere
+    in the document never moves it. Longer units are proportionally more likely to
+    end a segment, which keeps segments around SEGMENT_TARGET_CHUNKS chunks.
+    """
+    if not unit.strip():
+        return False
+    digest = hashlib.blake2b(unit.strip().encode("utf-8"), digest_size=8).digest()
+    position = int.from_bytes(digest, "little") / 2 ** 64
+    return position < len(unit) / (SEGMENT_TARGET_CHUNKS * chunk_size)
+
+
+def _split_units(text: str, max_unit_length: int) -> Tuple[List[str], str]:
+    """
+    Cut the complete units off the front of text and return them with the unfinished tail.
+
+    A unit whose end is not in sight yet stays in the tail, so the result does not depend
+    on where the page or block boundaries fell. Units without any line or sentence end
+    are cut every max_unit_length characters.
+    """
+    units: List[str] = []
+    start = 0
+    for match in _UNIT_END_PATTERN.finditer(text):
+        if match.end() == len(text):
+            # The whitespace run may continue in the next piece
+            break
+        unit = text[start:match.end()]
+        while len(unit) > max_unit_length:
+            units.append(unit[:max_unit_length])
+            unit = unit[max_unit_length:]
+        units.append(unit)
+        start = match.end()
+
+    tail = text[start:]
+    while len(tail) > max_unit_length:
+        units.append(tail[:max_unit_length])
+        tail = tail[max_unit_length:]
+    return units, tail
+
+
+def iter_chunks(pages: Iterator[str], chunk_size: int) -> Iterator[str]:
+    """
+    Split a stream of page texts into chunks without joining the whole document.
+
+    The pieces are concatenated unchanged and cut into units (lines and sentences).
+    Units are grouped into segments that end at content-defined boundaries, and each
+    segment is split on its own. Editing, adding or removing text therefore only
+    changes the chunks of the segments it touches, and where pages or blocks begin
+    has no effect on the result.
+    """
+    splitter = _make_splitter(chunk_size)
+    max_segment_length = SEGMENT_MAX_CHUNKS * chunk_size
+    pending = ""
+    segment: List[str] = []
+    segment_length = 0
+
+    for page in pages:
+        units, pending = _split_units(pending + page, max_segment_length)
+        for unit in units:
+            segment.append(unit)
+            segment_length += len(unit)
+            if _is_segment_boundary(unit, chunk_size) or segment_length >= max_segment_length:
+                yield from splitter.split_text("".join(segment))
+                segment = []
+                segment_length = 0
+
+    segment.append(pending)
+    yield from splitter.split_text("".join(segment))
+
+
+def chunk_id(document_id: str, text: str) -> str:
+    """Stable id of a chunk: the same text in the same document always maps to the same id"""
+    digest = hashlib.sha256()
+    digest.update(document_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _manifest_key(index_name: str, document_id: str) -> str:
+    return f"{index_name}|{document_id}"
+
+
+def get_document_chunk_ids(index_name: str, document_id: str) -> List[str]:
+    """Ids of the chunks indexed for a document by the last successful ingestion"""
+    return _manifests.get(_manifest_key(index_name, document_id)) or []
+
+
+def _produce_batches(pages: Iterator[str], chunk_size: int, batch_size: int, queue: "asyncio.Queue",
+                     loop: asyncio.AbstractEventLoop, stop: threading.Event, document_id: str,
+                     known_ids: Set[str]) -> Tuple[int, List[str]]:
+    """
+    Runs in a worker thread; blocks whenever the queue of pending batches is full.
+
+    Only chunks whose id is not in known_ids are queued. Returns the page count and
+    the ids of every chunk in the document.
+    """
+    def put(item) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    pages_seen = 0
+    chunk_ids: List[str] = []
+    seen_ids: Set[str] = set()
+
+    def counted_pages() -> Iterator[str]:
+        nonlocal pages_seen
+        for page in pages:
+            pages_seen += 1
+            yield page
+
+    try:
+        batch: List[Dict[str, Any]] = []
+        for chunk in iter_chunks(counted_pages(), chunk_size):
+            if stop.is_set():
+                break
+            chunk_key = chunk_id(document_id, chunk)
+            if chunk_key in seen_ids:
+                continue
+            seen_ids.add(chunk_key)
+            chunk_ids.append(chunk_key)
+            if chunk_key in known_ids:
+                # Unchanged since the last ingestion, already embedded
+                continue
+            batch.append({"id": chunk_key, "text": chunk})
+            if len(batch) >= batch_size:
+                put(batch)
+                batch = []
+        if batch and not stop.is_set():
+            put(batch)
+    except BaseException as e:
+        put(e)
+        raise
+    finally:
+        put(None)
+    return pages_seen, chunk_ids
+
+
+async def ingest_document(index, file: BinaryIO, filename: str, content_type: str = "",
+                          chunk_size: int = 500, index_name: str = "", document_id: Optional[str] = None,
+                          keyword_index=None,
+                          batch_size: int = INGEST_BATCH_SIZE,
+                          max_pending_batches: int = INGEST_MAX_PENDING_BATCHES) -> Dict[str, Any]:
+    """
+    Extract, chunk and upsert a document into index as a bounded pipeline.
+
+    Text extraction and chunking run in a worker thread and hand fixed-size batches
+    to the upserter through a bounded queue. When the index falls behind, the queue
+    fills up and extraction pauses, so memory stays flat regardless of document size.
+
+    Chunk ids are derived from document_id (the filename by default) and the chunk
+    text, and a manifest remembers which chunks each document has. Re-ingesting a
+    document therefore only embeds new or changed chunks and deletes the ones that
+    disappeared. A keyword_index, when given, receives the same upserts and deletes.
+    """
+    document_id = document_id or filename
+    pages = iter_document_pages(file, filename, content_type)
+
+    manifest_key = _manifest_key(index_name, document_id)
+    previous_ids = await asyncio.to_thread(_manifests.get, manifest_key) or []
+    known_ids = set(previous_ids)
+    if keyword_index is not None:
+        # Chunks indexed before hybrid search was switched on still need keyword entries
+        known_ids &= await asyncio.to_thread(keyword_index.existing_ids, previous_ids)
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_batches)
+    stop = threading.Event()
+    producer = asyncio.ensure_future(
+        asyncio.to_thread(_produce_batches, pages, chunk_size, batch_size, queue, loop, stop,
+                          document_id, known_ids)
+    )
+
+    chunks_upserted = 0
+    batches = 0
+    error = None
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        if isinstance(item, BaseException):
+            error = item
+            continue
+        if error is None:
+            try:
+                # Index clients are synchronous
+                await asyncio.to_thread(index.upsert, item)
+                if keyword_index is not None:
+                    await asyncio.to_thread(keyword_index.upsert, item)
+            except Exception as e:
+                # Stop extraction, but keep draining so the producer is never left blocked
+                error = e
+                stop.set()
+                continue
+            chunks_upserted += len(item)
+            batches += 1
+
+    try:
+        pages_read, chunk_ids = await producer
+    except BaseException:
+        if error is None:
+            raise
+    if error is not None:
+        raise error
+
+    current_ids = set(chunk_ids)
+    removed_ids = [key for key in previous_ids if key not in current_ids]
+    for start in range(0, len(removed_ids), batch_size):
+        await asyncio.to_thread(index.delete, removed_ids[start:start + batch_size])
+        if keyword_index is not None:
+            await asyncio.to_thread(keyword_index.delete, removed_ids[start:start + batch_size])
+    # Only recorded once the index matches it, so a failed run is simply redone next time
+    await asyncio.to_thread(_manifests.set, manifest_key, chunk_ids)
+
+    print(f"[INFO] Ingested {document_id}: {pages_read} pages, {len(chunk_ids)} chunks "
+          f"({chunks_upserted} upserted in {batches} batches, {len(removed_ids)} deleted)")
+    return {
+        "document_id": document_id,
+        "pages": pages_read,
+        "chunks": len(chunk_ids),
+        "chunks_upserted": chunks_upserted,
+        "chunks_unchanged": len(chunk_ids) - chunks_upserted,
+        "chunks_deleted": len(removed_ids),
+        "batches": batches,
+    }
@@ -0,0 +1,67 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Union
+
+_SEGMENT_PATTERN = re.compile(r"([^.\[\]]+)|\[(\*|-?\d+)\]")
+
+_WILDCARD = "*"
+
+
+def _parse_path(path: str) -> List[Union[str, int]]:
+    """Split "$.data.items[0].name" or "data.items.*.name" into keys, indexes and wildcards"""
+    if path.startswith("$"):
+        path = path[1:]
+    steps: List[Union[str, int]] = []
+    for key, index in _SEGMENT_PATTERN.findall(path):
+        token = key or index
+        if token == _WILDCARD:
+            steps.append(_WILDCARD)
+        elif re.fullmatch(r"-?\d+", token):
+            steps.append(int(token))
+        else:
+            steps.append(token)
+    return steps
+
+
+def _resolve(data: Any, steps: List[Union[str, int]]) -> Any:
+    for position, step in enumerate(steps):
+        if step == _WILDCARD:
+            if isinstance(data, dict):
+                data = list(data.values())
+            if not isinstance(data, list):
+                return None
+            rest = steps[position + 1:]
+            return [_resolve(item, rest) for item in data]
+        if isinstance(step, int):
+            if not isinstance(data, list) or not -len(data) <= step < len(data):
+                return None
+            data = data[step]
+        else:
+            if not isinstance(data, dict):
+                return None
+            data = data.get(step)
+        if data is None:
+            return None
+    return data
+
+
+def resolve_path(data: Any, path: str) -> Any:
+    """Value at a dotted path / simple JSONPath in data, None if any step is missing"""
+    return _resolve(data, _parse_path(path))
+
+
+def project(data: Any, projection: Dict[str, str]) -> Dict[str, Any]:
+    """Build {output name: value at path} from a decoded JSON document"""
+    return {name: resolve_path(data, path) for name, path in projection.items()}
+
+
+def dumps_compact(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def truncate_text(text: str, max_chars: Optional[int]) -> str:
+    """Cut text to max_chars, ending with a marker that says how much was dropped"""
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    dropped = len(text) - max_chars
+    return f"{text[:max_chars]}... [truncated {dropped} chars]"
@@ -0,0 +1,205 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_CODE_FENCE_PATTERN = re.compile(r"```[a-zA-Z0-9_-]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+_MISSING = object()
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, ValueError):
+        return _MISSING
+
+
+def _object_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Find the spans of top-level {...} candidates in text, respecting quoted strings.
+
+    An object that is never closed (a truncated tail) runs to the end of the text.
+    """
+    spans = []
+    depth = 0
+    start = None
+    quote = None
+    escaped = False
+
+    for i, char in enumerate(text):
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+            continue
+
+        if char == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i + 1))
+                start = None
+        elif depth > 0 and char in "\"'":
+            quote = char
+
+    if start is not None:
+        spans.append((start, len(text)))
+    return spans
+
+
+def repair_json(text: str) -> str:
+    """
+    Rewrite almost-JSON into valid JSON where possible.
+
+    Handles single-quoted strings, Python literals (True/False/None), trailing commas,
+    // and /* */ comments, and truncated input (unterminated strings, dangling keys,
+    unclosed brackets).
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    quote = None
+    i = 0
+    length = len(text)
+
+    while i < length:
+        char = text[i]
+
+        if quote:
+            if char == "\\" and i + 1 < length:
+                next_char = text[i + 1]
+                # \' is valid inside single-quoted strings but not in JSON
+                out.append(next_char if next_char == "'" else char + next_char)
+                i += 2
+                continue
+            if char == quote:
+                out.append('"')
+                quote = None
+            elif char == '"':
+                # Bare double quote inside a single-quoted string
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            else:
+                out.append(char)
+            i += 1
+            continue
+
+        if char in "\"'":
+            quote = char
+            out.append('"')
+        elif char == "/" and text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = length if newline == -1 else newline
+            continue
+        elif char == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+            continue
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+        elif char in "}]":
+            _strip_trailing_separator(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+        elif char.isalpha():
+            j = i
+            while j < length and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    # Truncated input: close the open string, drop dangling separators, close brackets
+    if quote:
+        out.append('"')
+    while stack:
+        _strip_trailing_separator(out, drop_dangling_key=stack[-1] == "}")
+        out.append(stack.pop())
+
+    return "".join(out)
+
+
+def _strip_trailing_separator(out: List[str], drop_dangling_key: bool = False) -> None:
+    """Remove a trailing comma (and, inside objects, a key left without a value)"""
+    while out and out[-1].isspace():
+        out.pop()
+
+    if drop_dangling_key and out and out[-1] == ":":
+        out.pop()
+        # Remove the key string that preceded the colon
+        while out and out[-1].isspace():
+            out.pop()
+        if out and out[-1] == '"':
+            out.pop()
+            while out and not (out[-1] == '"' and (len(out) < 2 or out[-2] != "\\")):
+                out.pop()
+            if out:
+                out.pop()
+        while out and out[-1].isspace():
+            out.pop()
+
+    if out and out[-1] == ",":
+        out.pop()
+    elif drop_dangling_key and out and out[-1] == '"':
+        # A key without a colon, e.g. {"a": 1, "b"
+        end = len(out) - 1
+        start = end - 1
+        while start >= 0 and not (out[start] == '"' and (start == 0 or out[start - 1] != "\\")):
+            start -= 1
+        before = start - 1
+        while before >= 0 and out[before].isspace():
+            before -= 1
+        if before >= 0 and out[before] in ",{":
+            del out[start:]
+            _strip_trailing_separator(out)
+
+
+def parse_json_lenient(text: str) -> Optional[Any]:
+    """
+    Parse model output that should contain JSON.
+
+    Strict json.loads is tried first. Otherwise code fences are unwrapped and the
+    largest {...} object that parses, directly or after repair_json, is returned.
+    Returns None when no JSON value can be recovered.
+    """
+    cleaned = text.strip()
+    parsed = _loads(cleaned)
+    if parsed is not _MISSING:
+        return parsed
+
+    candidates = [cleaned]
+    candidates.extend(match.group(1).strip() for match in _CODE_FENCE_PATTERN.finditer(cleaned))
+
+    best = None
+    best_size = 0
+    for candidate in candidates:
+        parsed = _loads(candidate)
+        if isinstance(parsed, dict) and len(candidate) > best_size:
+            best, best_size = parsed, len(candidate)
+            continue
+
+        for start, end in _object_spans(candidate):
+            size = end - start
+            if size <= best_size:
+                continue
+            fragment = candidate[start:end]
+            parsed = _loads(fragment)
+            if parsed is _MISSING:
+                parsed = _loads(repair_json(fragment))
+            if isinstance(parsed, dict):
+                best, best_size = parsed, size
+
+    return best
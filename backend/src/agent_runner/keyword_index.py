@@ -0,0 +1,105 @@
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from .agent_models import RAGConfig
+from .local_index import LOCAL_INDEX_DIR
+
+# Keep identifiers such as "P-1042" or "ERR_TIMEOUT" as single terms
+_TOKENIZER = "unicode61 tokenchars '-_'"
+_TERM_PATTERN = re.compile(r"[\w\-]+")
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index over chunk texts, stored in SQLite FTS5.
+
+    Kept next to the vector index and fed by the same ingestion, so exact terms like
+    part numbers and error codes can be matched even when embeddings blur them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # chunk_ids maps chunk ids to FTS rowids so updates and deletes don't scan the index
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunk_ids (id TEXT PRIMARY KEY)")
+        self._conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(text, tokenize=\"{_TOKENIZER}\")")
+        self._conn.commit()
+
+    def upsert(self, inputs: List[Dict[str, str]]) -> None:
+        """Insert or replace rows; each row needs an 'id' and a 'text' column"""
+        if not inputs:
+            return
+        with self._lock:
+            self._delete_rows([row["id"] for row in inputs])
+            self._conn.executemany("INSERT OR IGNORE INTO chunk_ids (id) VALUES (?)", [(row["id"],) for row in inputs])
+            self._conn.executemany(
+                "INSERT INTO chunks (rowid, text) SELECT rowid, ? FROM chunk_ids WHERE id = ?",
+                [(str(row["text"]), row["id"]) for row in inputs]
+            )
+            self._conn.commit()
+
+    def _delete_rows(self, ids: List[str]) -> None:
+        self._conn.executemany(
+            "DELETE FROM chunks WHERE rowid = (SELECT rowid FROM chunk_ids WHERE id = ?)", [(key,) for key in ids]
+        )
+
+    def delete(self, primary_keys: List[str]) -> None:
+        with self._lock:
+            self._delete_rows(primary_keys)
+            self._conn.executemany("DELETE FROM chunk_ids WHERE id = ?", [(key,) for key in primary_keys])
+            self._conn.commit()
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        """Subset of ids that are present in the index"""
+        found: Set[str] = set()
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT id FROM chunk_ids WHERE id IN ({placeholders})", batch).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def search(self, query_text: str, num_results: int) -> List[Tuple[str, float]]:
+        """Return (text, score) pairs for the best BM25 matches, highest score first"""
+        terms = {term.lower() for term in _TERM_PATTERN.findall(query_text)}
+        if not terms:
+            return []
+
+        # Quote every term so user text can never be read as FTS5 query syntax
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in sorted(terms))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text, bm25(chunks) FROM chunks WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?",
+                (match, num_results)
+            ).fetchall()
+        # FTS5 scores are negative, lower is better
+        return [(text, -score) for text, score in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_ids").fetchone()[0]
+
+
+_indexes: Dict[str, KeywordIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_keyword_index(rag_config: RAGConfig) -> KeywordIndex:
+    """Return the process-wide KeywordIndex stored beside the vector index of a RAG config"""
+    base_path = Path(rag_config.local_path) if rag_config.local_path else LOCAL_INDEX_DIR / rag_config.index_name
+    path = base_path / "keywords.sqlite3"
+    key = str(path.resolve())
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = KeywordIndex(path)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .agent_models import RAGConfig
+from .tool_loader import load_function_from_file
+
+current_dir = Path(__file__).resolve().parent
+
+# Directory holding local vector indexes, one sub-directory per index name
+LOCAL_INDEX_DIR = Path(os.environ.get("LANGSKETCH_INDEX_DIR", current_dir.parent / ".langsketch-index"))
+
+EmbeddingFunction = Callable[[List[str]], Any]
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """
+    Dependency-free local embedding: hashed word unigrams and bigrams, L2-normalized.
+
+    Good enough for keyword-ish similarity and offline tests; plug in a real model
+    through RAGConfig.embedding_function for semantic search.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _bucket(self, feature: str) -> int:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_PATTERN.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                bucket = self._bucket(feature)
+                # Signed hashing keeps collisions from only ever adding up
+                vectors[row, bucket % self.dim] += 1.0 if bucket & (1 << 63) else -1.0
+        return _normalize(vectors)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def load_embedding_function(spec: Optional[str]) -> EmbeddingFunction:
+    """
+    Resolve an embedding function from "path/to/file.py:function_name".
+
+    The function takes a list of texts and returns one vector per text. Without a
+    spec the built-in HashingEmbedder is used.
+    """
+    if not spec:
+        return HashingEmbedder()
+
+    code_path, _, function_name = spec.rpartition(":")
+    if not code_path or not function_name:
+        raise ValueError(f"Invalid embedding_function '{spec}', expected 'path/to/file.py:function_name'")
+    return load_function_from_file(code_path, function_name)
+
+
+class LocalVectorIndex:
+    """
+    In-process vector index persisted to a directory.
+
+    Vectors live in a float32 file that is memory-mapped for search; ids and texts
+    live in rows.json. With index_type="ivf" vectors are also clustered around
+    nlist k-means centroids and a query only scans the nprobe closest clusters.
+
+    similarity_search/upsert/delete mirror the Databricks VectorSearchIndex calls
+    used by the runtime, so the two providers are interchangeable.
+    """
+
+    def __init__(self, path: Path, embedding_function: EmbeddingFunction, index_type: str = "flat",
+                 nlist: int = 64, nprobe: int = 8):
+        self.path = Path(path)
+        self.embedding_function = embedding_function
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+
+        self._rows: List[Optional[Dict[str, Any]]] = []
+        self._positions: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._dim: Optional[int] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.path / "vectors.f32"
+
+    @property
+    def _rows_path(self) -> Path:
+        return self.path / "rows.json"
+
+    @property
+    def _ivf_path(self) -> Path:
+        return self.path / "ivf.npz"
+
+    def _load(self) -> None:
+        if not self._rows_path.exists():
+            return
+
+        with open(self._rows_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self._dim = state["dim"]
+        self._rows = state["rows"]
+        self._positions = {row["id"]: i for i, row in enumerate(self._rows) if row is not None}
+        self._map_vectors()
+
+        if self.index_type == "ivf" and self._ivf_path.exists():
+            ivf = np.load(self._ivf_path)
+            self._centroids = ivf["centroids"]
+            self._assignments = ivf["assignments"]
+
+    def _map_vectors(self) -> None:
+        if self._rows and self._vectors_path.exists():
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                      shape=(len(self._rows), self._dim))
+        else:
+            self._vectors = None
+
+    def _save_rows(self) -> None:
+        tmp_path = self._rows_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self._dim, "rows": self._rows}, f)
+        os.replace(tmp_path, self._rows_path)
+
+    def _save_ivf(self) -> None:
+        if self._centroids is not None:
+            with open(self._ivf_path, "wb") as f:
+                np.savez(f, centroids=self._centroids, assignments=self._assignments)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embedding_function(texts), dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise ValueError("Embedding function must return one vector per input text")
+        return _normalize(vectors)
+
+    def upsert(self, inputs: List[Dict[str, Any]]) -> None:
+        """Insert or replace rows; each row needs an 'id' and a 'text' column"""
+        if not inputs:
+            return
+
+        vectors = self._embed([str(row["text"]) for row in inputs])
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self._dim}")
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            new_rows = []
+            new_vectors = []
+
+            if self._vectors_path.exists() and self._rows:
+                writable = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                     shape=(len(self._rows), self._dim))
+            else:
+                writable = None
+
+            for row, vector in zip(inputs, vectors):
+                position = self._positions.get(row["id"])
+                if position is not None:
+                    # Existing id: overwrite in place
+                    writable[position] = vector
+                    self._rows[position] = dict(row)
+                else:
+                    self._positions[row["id"]] = len(self._rows) + len(new_rows)
+                    new_rows.append(dict(row))
+                    new_vectors.append(vector)
+
+            if writable is not None:
+                writable.flush()
+                del writable
+
+            if new_vectors:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(np.stack(new_vectors).astype(np.float32).tobytes())
+                self._rows.extend(new_rows)
+
+            self._save_rows()
+            self._map_vectors()
+            self._update_ivf(vectors)
+
+    def delete(self, primary_keys: List[str]) -> None:
+        """Remove rows by id; space is reclaimed once a quarter of the rows are deleted"""
+        with self._lock:
+            for key in primary_keys:
+                position = self._positions.pop(key, None)
+                if position is not None:
+                    self._rows[position] = None
+
+            deleted = sum(1 for row in self._rows if row is None)
+            if self._rows and deleted * 4 >= len(self._rows):
+                self._compact()
+            else:
+                self._save_rows()
+
+    def _compact(self) -> None:
+        keep = [i for i, row in enumerate(self._rows) if row is not None]
+        vectors = np.array(self._vectors[keep]) if self._vectors is not None and keep else None
+        self._vectors = None
+
+        self._rows = [self._rows[i] for i in keep]
+        self._positions = {row["id"]: i for i, row in enumerate(self._rows)}
+
+        tmp_path = self._vectors_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            if vectors is not None:
+                f.write(vectors.astype(np.float32).tobytes())
+        os.replace(tmp_path, self._vectors_path)
+
+        if self._assignments is not None:
+            # Surviving rows keep their clusters
+            self._assignments = self._assignments[[i for i in keep if i < len(self._assignments)]]
+
+        self._save_rows()
+        self._map_vectors()
+        self._update_ivf(None)
+
+    def _update_ivf(self, new_vectors: Optional[np.ndarray]) -> None:
+        if self.index_type != "ivf" or self._vectors is None:
+            return
+
+        count = len(self._rows)
+        if self._centroids is None or self._assignments is None or len(self._assignments) * 2 < count:
+            # (Re)train once there is enough data, and again whenever the index doubles
+            if count >= self.nlist * 4:
+                self._train_ivf()
+            return
+
+        # Assign only the rows appended since the last training
+        if len(self._assignments) < count:
+            tail = np.asarray(self._vectors[len(self._assignments):])
+            tail_assignments = np.argmax(tail @ self._centroids.T, axis=1).astype(np.int32)
+            self._assignments = np.concatenate([self._assignments, tail_assignments])
+        elif new_vectors is not None:
+            # Rows updated in place may move to another cluster
+            self._assignments = np.argmax(np.asarray(self._vectors) @ self._centroids.T, axis=1).astype(np.int32)
+        self._save_ivf()
+
+    def _train_ivf(self, iterations: int = 10) -> None:
+        vectors = np.asarray(self._vectors)
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(len(vectors), size=self.nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cluster in range(self.nlist):
+                members = vectors[assignments == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self._centroids = centroids
+        self._assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        self._save_ivf()
+
+    def similarity_search(self, num_results: int, columns: List[str], query_text: str, **kwargs) -> Dict[str, Any]:
+        """Return the closest rows in the Databricks response shape: one list per row, score last"""
+        with self._lock:
+            vectors = self._vectors
+            rows = self._rows
+            centroids = self._centroids
+            assignments = self._assignments
+
+        if vectors is None or not rows:
+            return {"result": {"data_array": []}}
+
+        query = self._embed([query_text])[0]
+
+        if centroids is not None and assignments is not None:
+            nearest_clusters = np.argsort(centroids @ query)[::-1][:self.nprobe]
+            candidates = np.flatnonzero(np.isin(assignments, nearest_clusters))
+            scores = np.asarray(vectors[candidates]) @ query
+        else:
+            candidates = np.arange(len(rows))
+            scores = np.asarray(vectors) @ query
+
+        data_array = []
+        for i in np.argsort(scores)[::-1]:
+            row = rows[candidates[i]]
+            if row is None:
+                continue
+            data_array.append([row.get(column) for column in columns] + [float(scores[i])])
+            if len(data_array) >= num_results:
+                break
+
+        return {"result": {"data_array": data_array}}
+
+    def count(self) -> int:
+        return len(self._positions)
+
+
+_indexes: Dict[str, LocalVectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_local_index(rag_config: RAGConfig) -> LocalVectorIndex:
+    """Return the process-wide LocalVectorIndex for a RAG config, opening it on first use"""
+    path = Path(rag_config.local_path) if rag_config.local_path else LOCAL_INDEX_DIR / rag_config.index_name
+    key = str(path.resolve())
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = LocalVectorIndex(
+                path,
+                load_embedding_function(rag_config.embedding_function),
+                index_type=rag_config.index_type,
+            )
+            _indexes[key] = index
+        return index
@@ -1,13 +1,21 @@
+import hashlib
 import json
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 from pydantic import ValidationError
 
 from .agent_models import AgentSystemConfig
 from .agent_runtime import AgentRuntime
 
+# Maximum number of built agents kept alive by the registry
+AGENT_REGISTRY_MAX_SIZE = int(os.environ.get("LANGSKETCH_AGENT_REGISTRY_SIZE", "32"))
 
-def load_json_file(agent_name: str) -> dict:
-    """Load a single JSON file from ./agents directory that matches agent_name (without .json)."""
+
+def _agent_file_path(agent_name: str) -> Path:
+    """Resolve the JSON config path for agent_name inside the ./agents directory."""
     base_path = Path(__file__).parent.parent / "agents"
     if not base_path.exists():
         raise FileNotFoundError(f"'agents' directory does not exist in {Path.cwd()}")
@@ -16,19 +24,121 @@ def load_json_file(agent_name: str) -> dict:
     if not file_path.exists():
         raise FileNotFoundError(f"No JSON file found at {file_path}")
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON in {file_path}: {e}")
+    return file_path
 
 
-def build_agent(agent_name: str) -> AgentRuntime:
-    """Build and return an AgentRuntime instance from the config."""
-    config = load_json_file(agent_name)
+def _parse_json(raw: bytes, file_path: Path) -> dict:
     try:
-        validated = AgentSystemConfig(**config)
+        return json.loads(raw.decode("utf-8"))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in {file_path}: {e}")
+
+
+def load_json_file(agent_name: str) -> dict:
+    """Load a single JSON file from ./agents directory that matches agent_name (without .json)."""
+    file_path = _agent_file_path(agent_name)
+    return _parse_json(file_path.read_bytes(), file_path)
+
+
+def _validate_config(config: dict) -> AgentSystemConfig:
+    try:
+        return AgentSystemConfig(**config)
     except ValidationError as e:
         print("Validation error:", e)
         raise
-    return AgentRuntime(validated)
+
+
+class AgentRegistry:
+    """
+    Process-wide LRU cache of built AgentRuntime instances.
+
+    Entries are keyed by agent name and the SHA-256 of the config file contents, so
+    editing the file yields a new entry. The file is only re-read and re-hashed when
+    its mtime or size changes.
+    """
+
+    def __init__(self, max_size: int = AGENT_REGISTRY_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], AgentRuntime]" = OrderedDict()
+        # path -> (mtime_ns, size, content hash)
+        self._file_state: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def _content_hash(self, file_path: Path) -> Tuple[str, Optional[bytes]]:
+        """Return the config hash, plus the raw bytes if the file had to be re-read."""
+        stat = file_path.stat()
+        key = str(file_path.resolve())
+        with self._lock:
+            cached = self._file_state.get(key)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2], None
+
+        raw = file_path.read_bytes()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            self._file_state[key] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash, raw
+
+    def get(self, agent_name: str) -> AgentRuntime:
+        """Return a built AgentRuntime for agent_name, building it if the config is new or changed."""
+        file_path = _agent_file_path(agent_name)
+        content_hash, raw = self._content_hash(file_path)
+        key = (agent_name, content_hash)
+
+        with self._lock:
+            runtime = self._entries.get(key)
+            if runtime is not None:
+                self._entries.move_to_end(key)
+                return runtime
+
+        if raw is None:
+            raw = file_path.read_bytes()
+        runtime = AgentRuntime(_validate_config(_parse_json(raw, file_path)))
+
+        with self._lock:
+            # Drop entries built from older versions of this agent's config
+            for stale_key in [k for k in self._entries if k[0] == agent_name and k != key]:
+                del self._entries[stale_key]
+
+            self._entries[key] = runtime
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return runtime
+
+    def invalidate(self, agent_name: Optional[str] = None) -> None:
+        """Forget one agent, or every agent when agent_name is None."""
+        with self._lock:
+            if agent_name is None:
+                self._entries.clear()
+                self._file_state.clear()
+                return
+
+            for key in [k for k in self._entries if k[0] == agent_name]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_registry = AgentRegistry()
+
+
+def get_agent_registry() -> AgentRegistry:
+    """Return the process-wide agent registry."""
+    return _registry
+
+
+def build_agent(agent_name: str, use_registry: bool = True) -> AgentRuntime:
+    """
+    Build and return an AgentRuntime instance from the config.
+
+    By default the runtime comes from the process-wide registry and is only rebuilt
+    when the agent's JSON file changes. Pass use_registry=False to always build a
+    fresh, unshared instance.
+    """
+    if use_registry:
+        return _registry.get(agent_name)
+
+    return AgentRuntime(_validate_config(load_json_file(agent_name)))
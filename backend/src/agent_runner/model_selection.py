@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .caching import DiskCache
+from .runtime_context import get_runtime_context
+
+# How long a routing decision stays valid on disk
+MODEL_CACHE_TTL_SECONDS = float(os.environ.get("LANGSKETCH_MODEL_CACHE_TTL", 7 * 24 * 3600))
+
+_ROUTER_RULES_PATH = Path(__file__).resolve().parent / "llm_router.py"
+
+_disk_cache = DiskCache("model_selection", ttl_seconds=MODEL_CACHE_TTL_SECONDS)
+# key -> (model, expires_at)
+_memory_cache: Dict[str, Tuple[str, float]] = {}
+_memory_lock = threading.Lock()
+_rules_fingerprint: Optional[str] = None
+
+
+def _router_rules_fingerprint() -> str:
+    """Hash of the routing rule definitions, so editing llm_router.py invalidates old selections"""
+    global _rules_fingerprint
+    if _rules_fingerprint is None:
+        _rules_fingerprint = hashlib.sha256(_ROUTER_RULES_PATH.read_bytes()).hexdigest()
+    return _rules_fingerprint
+
+
+def _cache_key(description: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(_router_rules_fingerprint().encode("utf-8"))
+    digest.update(description.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def select_model(description: str) -> str:
+    """
+    Return the model the deimos router picks for an agent description.
+
+    Selections are memoized in-process and persisted on disk, so the router (and its
+    classification LLM call) only runs for descriptions it has not seen recently.
+    """
+    key = _cache_key(description)
+
+    with _memory_lock:
+        entry = _memory_cache.get(key)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+
+    cached = _disk_cache.get(key)
+    if cached is not None:
+        with _memory_lock:
+            _memory_cache[key] = (cached, time.time() + MODEL_CACHE_TTL_SECONDS)
+        return cached
+
+    from deimos_router import get_router
+
+    router_name = get_runtime_context().router_name
+    router = get_router(router_name)
+
+    if router is None:
+        raise ValueError(f"Router {router_name} not found. Available routers: {list(get_router.__globals__['_router_registry'].keys())}")
+
+    selected_model = router.select_model({'messages': description})
+
+    _disk_cache.set(key, selected_model)
+    with _memory_lock:
+        _memory_cache[key] = (selected_model, time.time() + MODEL_CACHE_TTL_SECONDS)
+    return selected_model
+
+
+def invalidate_model_cache(description: Optional[str] = None) -> None:
+    """Forget the cached selection for one description, or all selections when description is None"""
+    with _memory_lock:
+        if description is None:
+            _memory_cache.clear()
+        else:
+            _memory_cache.pop(_cache_key(description), None)
+
+    if description is None:
+        _disk_cache.clear()
+    else:
+        _disk_cache.delete(_cache_key(description))
@@ -0,0 +1,53 @@
+import math
+import re
+from typing import Dict, List
+
+_TERM_PATTERN = re.compile(r"[\w\-]+")
+
+# Standard RRF damping constant; larger values flatten the contribution of top ranks
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(result_lists: List[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """Fuse ranked lists of chunk texts into one score per text: sum of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, text in enumerate(results):
+            scores[text] = scores.get(text, 0.0) + 1.0 / (k + rank + 1)
+    return scores
+
+
+def _terms(text: str) -> List[str]:
+    return [term.lower() for term in _TERM_PATTERN.findall(text)]
+
+
+def rerank(query: str, fused_scores: Dict[str, float], num_results: int) -> List[str]:
+    """
+    Order fused candidates by fusion score blended with query term coverage.
+
+    Coverage is the IDF-weighted share of query terms found in the chunk (IDF over
+    the candidate set), and terms containing digits such as part numbers or error
+    codes count double, since an exact hit on them is a strong relevance signal.
+    """
+    if not fused_scores:
+        return []
+
+    query_terms = set(_terms(query))
+    candidates = list(fused_scores)
+    candidate_terms = [set(_terms(text)) for text in candidates]
+
+    weights = {}
+    for term in query_terms:
+        document_frequency = sum(1 for terms in candidate_terms if term in terms)
+        weight = math.log(1 + len(candidates) / (1 + document_frequency))
+        weights[term] = weight * 2 if any(char.isdigit() for char in term) else weight
+    total_weight = sum(weights.values()) or 1.0
+
+    top_fused = max(fused_scores.values())
+    scored = []
+    for text, terms in zip(candidates, candidate_terms):
+        coverage = sum(weight for term, weight in weights.items() if term in terms) / total_weight
+        scored.append((0.5 * fused_scores[text] / top_fused + 0.5 * coverage, text))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [text for _, text in scored[:num_results]]
@@ -0,0 +1,104 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+current_dir = Path(__file__).resolve().parent
+
+CREDENTIALS_PATH = current_dir.parent / ".langsketch-credentials.json"
+
+
+class RuntimeContext:
+    """
+    Process-wide state shared by every AgentRuntime: credentials, the Databricks
+    vector search client and the registered LLM router.
+
+    Nothing is read, connected or registered until it is first used, so importing
+    the package stays cheap and works without a credentials file.
+    """
+
+    def __init__(self, credentials_path: Path = CREDENTIALS_PATH):
+        self.credentials_path = Path(credentials_path)
+        self._lock = threading.RLock()
+        self._credentials: Optional[Dict[str, Any]] = None
+        self._vector_search_client = None
+        self._router_name: Optional[str] = None
+
+    @property
+    def credentials(self) -> Dict[str, Any]:
+        """Contents of .langsketch-credentials.json (empty if the file does not exist)"""
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    if self.credentials_path.exists():
+                        with open(self.credentials_path, "r", encoding="utf-8") as f:
+                            self._credentials = json.load(f)
+                    else:
+                        self._credentials = {}
+        return self._credentials
+
+    @property
+    def martian_key(self) -> Optional[str]:
+        for entry in self.credentials.get("llmKeys", []):
+            if entry.get("provider") == "martian":
+                return entry.get("apiKey")
+        return None
+
+    @property
+    def databricks_credentials(self) -> Dict[str, Optional[str]]:
+        databricks_creds = self.credentials.get("databricksCredentials", [])
+        creds = databricks_creds[0] if databricks_creds else {}
+        return {
+            "workspace_url": creds.get("workspaceUrl"),
+            "personal_token": creds.get("personalToken"),
+        }
+
+    @property
+    def vector_search_client(self):
+        """Databricks VectorSearchClient, created on first access"""
+        if self._vector_search_client is None:
+            with self._lock:
+                if self._vector_search_client is None:
+                    creds = self.databricks_credentials
+                    if not (creds["workspace_url"] and creds["personal_token"]):
+                        raise ValueError("Databricks credentials not found in JSON.")
+
+                    from databricks.vector_search.client import VectorSearchClient
+
+                    self._vector_search_client = VectorSearchClient(
+                        workspace_url=creds["workspace_url"],
+                        personal_access_token=creds["personal_token"]
+                    )
+        return self._vector_search_client
+
+    @property
+    def router_name(self) -> str:
+        """Name of the deimos router, registering its rules on first access"""
+        if self._router_name is None:
+            with self._lock:
+                if self._router_name is None:
+                    from .llm_router import setup_intelligent_router
+
+                    self._router_name = setup_intelligent_router()
+        return self._router_name
+
+
+_context: Optional[RuntimeContext] = None
+_context_lock = threading.Lock()
+
+
+def get_runtime_context() -> RuntimeContext:
+    """Return the process-wide RuntimeContext, creating it on first call"""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = RuntimeContext()
+    return _context
+
+
+def reset_runtime_context() -> None:
+    """Drop the process-wide context, e.g. in a forked worker or after credentials change"""
+    global _context
+    with _context_lock:
+        _context = None
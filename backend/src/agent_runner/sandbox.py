@@ -0,0 +1,269 @@
+import importlib.util
+import multiprocessing
+import os
+import threading
+from collections import deque
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Tuple
+
+from .agent_models import SandboxConfig
+
+# Worker processes per pool; CPU-bound tools gain nothing from more
+SANDBOX_WORKERS = int(os.environ.get("LANGSKETCH_SANDBOX_WORKERS", str(os.cpu_count() or 2)))
+# String/bytes arguments at least this large go through shared memory instead of the pipe;
+# bytes arguments then reach the tool as read-only memoryviews of the block, without a copy
+SHARED_MEMORY_THRESHOLD = 1024 * 1024
+
+
+class SandboxError(RuntimeError):
+    """A sandboxed tool call failed, timed out, or lost its worker"""
+
+
+class _SharedArgument:
+    """Placeholder for an argument placed in a shared memory block"""
+
+    def __init__(self, name: str, size: int, is_text: bool):
+        self.name = name
+        self.size = size
+        self.is_text = is_text
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int]) -> None:
+    """Worker loop: load functions once, run calls until told to stop or the pipe closes"""
+    if memory_limit_mb:
+        try:
+            import resource
+
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            # Not supported on this platform, run without the limit
+            pass
+
+    # (code path, modification time, function name) -> function, so an edited file is loaded again
+    functions: Dict[Tuple[str, int, str], Any] = {}
+    # Blocks a tool still has buffers of; they can't be closed, and must not be closed again on collection
+    kept_blocks: List[SharedMemory] = []
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+
+        code_path, mtime_ns, function_name, kwargs = message
+        views: List[Tuple[SharedMemory, memoryview]] = []
+        try:
+            key = (code_path, mtime_ns, function_name)
+            function = functions.get(key)
+            if function is None:
+                for stale_key in [k for k in functions if k[0] == code_path and k[1] != mtime_ns]:
+                    del functions[stale_key]
+                function = _load_function(code_path, function_name)
+                functions[key] = function
+
+            result = function(**{name: _read_argument(value, views) for name, value in kwargs.items()})
+            conn.send(("ok", str(result)))
+        except MemoryError:
+            conn.send(("error", "Tool exceeded its memory limit"))
+        except BaseException as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            # Views of shared arguments are only valid during the call
+            for block, view in views:
+                try:
+                    view.release()
+                    block.close()
+                except BufferError:
+                    kept_blocks.append(block)
+
+
+def _load_function(code_path: str, function_name: str) -> Any:
+    # Module names only need to be unique within the worker
+    spec = importlib.util.spec_from_file_location(f"sandboxed_{abs(hash(code_path))}", code_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Could not load module from {code_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    function = getattr(module, function_name, None)
+    if not callable(function):
+        raise AttributeError(f"Function '{function_name}' not found in {code_path}")
+    return function
+
+
+def _read_argument(value: Any, views: List[Tuple[SharedMemory, memoryview]]) -> Any:
+    """Resolve a shared argument; views collects the blocks that must stay open for the call"""
+    if not isinstance(value, _SharedArgument):
+        return value
+    block = SharedMemory(name=value.name)
+    if value.is_text:
+        try:
+            # str needs its own decoded copy
+            return bytes(block.buf[:value.size]).decode("utf-8")
+        finally:
+            block.close()
+    view = block.buf[:value.size].toreadonly()
+    views.append((block, view))
+    return view
+
+
+class _Worker:
+    def __init__(self, context, memory_limit_mb: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+
+    def stop(self, force: bool = False) -> None:
+        if not force:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Warm pool of worker processes that run file-based tool functions.
+
+    Workers are started with the pool, keep their imported modules between calls
+    (until the code file changes), run under an address-space limit, and are replaced
+    after max_calls_per_worker calls. A call that exceeds its timeout has its worker
+    killed, so runaway code never blocks the agent process. Replacements are started
+    right away, so calls rarely wait for a process to start.
+    """
+
+    def __init__(self, size: int = SANDBOX_WORKERS, memory_limit_mb: Optional[int] = None,
+                 max_calls_per_worker: int = 100):
+        self.size = size
+        self.memory_limit_mb = memory_limit_mb
+        self.max_calls_per_worker = max_calls_per_worker
+        # spawn: forking a process that runs threads and event loops is unsafe
+        self._context = multiprocessing.get_context("spawn")
+        # Warm workers are taken from and returned to the right, new ones join on the left
+        # so they have time to boot before their first call
+        self._idle: "deque[_Worker]" = deque()
+        self._slots = threading.BoundedSemaphore(size)
+        for _ in range(size):
+            self._idle.appendleft(self._new_worker())
+
+    def _new_worker(self) -> _Worker:
+        return _Worker(self._context, self.memory_limit_mb)
+
+    def _replace_worker(self) -> None:
+        try:
+            self._idle.appendleft(self._new_worker())
+        except OSError as e:
+            # _take_worker starts one on demand instead
+            print(f"[WARNING] Could not start a sandbox worker: {str(e)}")
+
+    def _take_worker(self) -> _Worker:
+        try:
+            worker = self._idle.pop()
+            if worker.process.is_alive():
+                return worker
+            worker.stop()
+        except IndexError:
+            pass
+        return self._new_worker()
+
+    def _share_arguments(self, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[SharedMemory]]:
+        shared_blocks = []
+        arguments = {}
+        for name, value in kwargs.items():
+            if isinstance(value, (str, bytes, bytearray)) and len(value) >= SHARED_MEMORY_THRESHOLD:
+                data = value.encode("utf-8") if isinstance(value, str) else value
+                block = SharedMemory(create=True, size=max(len(data), 1))
+                block.buf[:len(data)] = data
+                shared_blocks.append(block)
+                arguments[name] = _SharedArgument(block.name, len(data), isinstance(value, str))
+            else:
+                arguments[name] = value
+        return arguments, shared_blocks
+
+    def call(self, code_path: str, function_name: str, kwargs: Dict[str, Any], timeout: Optional[float]) -> str:
+        """Run function_name from code_path in a worker and return its result as a string"""
+        try:
+            mtime_ns = os.stat(code_path).st_mtime_ns
+        except OSError as e:
+            raise SandboxError(f"Could not read tool code at {code_path}: {str(e)}") from e
+        arguments, shared_blocks = self._share_arguments(kwargs)
+        try:
+            with self._slots:
+                worker = self._take_worker()
+                try:
+                    worker.conn.send((code_path, mtime_ns, function_name, arguments))
+                    if not worker.conn.poll(timeout):
+                        raise SandboxError(f"Tool exceeded its {timeout}s timeout and was stopped")
+                    status, payload = worker.conn.recv()
+                except SandboxError:
+                    # Still running the call, it won't read a stop message
+                    worker.stop(force=True)
+                    self._replace_worker()
+                    raise
+                except (EOFError, OSError) as e:
+                    worker.stop(force=True)
+                    self._replace_worker()
+                    raise SandboxError(f"Tool worker exited unexpectedly (exit code {worker.process.exitcode})") from e
+
+                worker.calls += 1
+                if worker.calls >= self.max_calls_per_worker:
+                    # Recycle to shed leaked memory and state; the old process exits off the call path
+                    threading.Thread(target=worker.stop, daemon=True).start()
+                    self._replace_worker()
+                else:
+                    self._idle.append(worker)
+        finally:
+            for block in shared_blocks:
+                block.close()
+                block.unlink()
+
+        if status == "error":
+            raise SandboxError(payload)
+        return payload
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                self._idle.pop().stop()
+            except IndexError:
+                return
+
+
+_pools: Dict[Tuple[Optional[int], int], SandboxPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_sandbox_pool(sandbox_config: SandboxConfig) -> SandboxPool:
+    """Return the shared pool for a memory limit / recycling policy, creating it on first use"""
+    key = (sandbox_config.memory_limit_mb, sandbox_config.max_calls_per_worker)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SandboxPool(
+                memory_limit_mb=sandbox_config.memory_limit_mb,
+                max_calls_per_worker=sandbox_config.max_calls_per_worker,
+            )
+            _pools[key] = pool
+        return pool
+
+
+class SandboxedFunction:
+    """Callable stand-in for a tool function that executes in the sandbox pool"""
+
+    def __init__(self, code_path: str, function_name: str, sandbox_config: SandboxConfig):
+        self.code_path = os.path.abspath(code_path)
+        self.function_name = function_name
+        self.sandbox_config = sandbox_config
+        self.pool = get_sandbox_pool(sandbox_config)
+
+    def __call__(self, **kwargs) -> str:
+        return self.pool.call(self.code_path, self.function_name, kwargs, self.sandbox_config.timeout_seconds)
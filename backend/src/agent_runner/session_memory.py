@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory LangGraph checkpointer that caps how many conversation threads it keeps.
+
+    Threads are evicted least-recently-used first once max_threads is exceeded, and
+    any thread idle for longer than max_age_seconds is dropped on the next write.
+    """
+
+    def __init__(self, max_threads: int = 1000, max_age_seconds: Optional[float] = 3600, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.max_age_seconds = max_age_seconds
+        # thread_id -> last access time, oldest first
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._access_lock = threading.Lock()
+        # Guards the storage/writes/blobs dicts against deletion while other runs write
+        self._data_lock = threading.Lock()
+
+    def _touch(self, thread_id: str) -> None:
+        with self._access_lock:
+            self._last_access[thread_id] = time.time()
+            self._last_access.move_to_end(thread_id)
+
+    def _evict(self) -> None:
+        now = time.time()
+        expired = []
+        with self._access_lock:
+            while self._last_access:
+                thread_id, last_access = next(iter(self._last_access.items()))
+                too_many = len(self._last_access) > self.max_threads
+                too_old = self.max_age_seconds is not None and now - last_access > self.max_age_seconds
+                if not (too_many or too_old):
+                    break
+                self._last_access.popitem(last=False)
+                expired.append(thread_id)
+
+        for thread_id in expired:
+            self._delete_thread_data(thread_id)
+
+    def _delete_thread_data(self, thread_id: str) -> None:
+        with self._data_lock:
+            super().delete_thread(thread_id)
+            # MemorySaver.delete_thread leaves channel blobs behind
+            for key in [k for k in list(self.blobs) if k[0] == thread_id]:
+                self.blobs.pop(key, None)
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self._last_access:
+            self._touch(thread_id)
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._data_lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"])
+        self._evict()
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._data_lock:
+            return super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._access_lock:
+            self._last_access.pop(thread_id, None)
+        self._delete_thread_data(thread_id)
+
+    def thread_count(self) -> int:
+        return len(self._last_access)
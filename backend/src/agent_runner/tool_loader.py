@@ -1,12 +1,147 @@
+import asyncio
+import concurrent.futures
+import hashlib
 import importlib.util
+import inspect
 import os
 import json
+import re
+import sys
+import threading
+import time
+import weakref
+from pathlib import Path
+from types import ModuleType
+import httpx
 import requests
-from typing import Any, List, Optional, Type
+from typing import Any, Dict, List, Optional, Tuple, Type
 from pydantic import BaseModel, Field, create_model, ConfigDict
 from langchain.tools import BaseTool
-from langchain.callbacks.manager import CallbackManagerForToolRun
+from langchain.callbacks.manager import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
 from .agent_models import ToolConfig, ToolInputConfig, ToolOutputConfig, FieldConfig, APIConfig, AuthConfig
+from .api_resilience import (
+    IDEMPOTENT_METHODS,
+    circuit_open_error,
+    counts_as_failure,
+    get_circuit_breaker,
+    is_retryable_status,
+    max_attempts,
+    retry_delay,
+)
+from .caching import TTLCache, get_cache
+from .coalescing import SingleFlight, get_singleflight
+from .http_pool import get_async_http_client, get_http_session
+from .json_projection import dumps_compact, project, truncate_text
+
+# Results starting with these are failures and never cached
+_ERROR_RESULT_PREFIXES = ("Error", "API Error", "Request Error")
+
+# Threads shared by all agents for running sync tool functions from async runs
+TOOL_WORKERS = int(os.environ.get("LANGSKETCH_TOOL_WORKERS", "32"))
+_tool_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+
+def _get_tool_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = concurrent.futures.ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+        return _tool_executor
+
+
+class ToolConcurrencyLimiter:
+    """
+    Caps how many tool calls of one agent run at the same time in async runs.
+
+    asyncio semaphores belong to one event loop, so one is kept per loop. Sync runs
+    are capped by the max_concurrency of the LangGraph run config instead.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.limit)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+
+# resolved path -> (mtime_ns, size, module)
+_module_cache: Dict[str, Tuple[int, int, ModuleType]] = {}
+_module_locks: Dict[str, threading.Lock] = {}
+_module_cache_lock = threading.Lock()
+
+
+def _module_name(path: str) -> str:
+    # Unique per file, so tools from different files never replace each other in sys.modules
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+    stem = re.sub(r"\W", "_", Path(path).stem)
+    return f"langsketch_tool_{stem}_{digest}"
+
+
+def load_module_from_file(code_path: str) -> ModuleType:
+    """
+    Import a Python file once per process and return the module.
+
+    Modules are cached by resolved path and reloaded only when the file's mtime or
+    size changes, so every agent referencing the file shares one module and its
+    imports run once. Bytecode is cached in __pycache__ by the standard source loader.
+    """
+    if not os.path.exists(code_path):
+        raise FileNotFoundError(f"Code file not found: {code_path}")
+    
+    path = str(Path(code_path).resolve())
+    with _module_cache_lock:
+        path_lock = _module_locks.setdefault(path, threading.Lock())
+    
+    # Per-file lock: concurrent builds wait for one import instead of running it twice
+    with path_lock:
+        stat = os.stat(path)
+        cached = _module_cache.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        
+        # Create a module spec and load the module
+        module_name = _module_name(path)
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Could not load module from {code_path}")
+        
+        module = importlib.util.module_from_spec(spec)
+        # Registered before executing so dataclasses, pickling and typing can resolve it
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
+        
+        _module_cache[path] = (stat.st_mtime_ns, stat.st_size, module)
+        return module
+
+
+def load_function_from_file(code_path: str, function_name: str) -> Any:
+    """Dynamically load a function from a Python file"""
+    module = load_module_from_file(code_path)
+    
+    # Get the specified function
+    if not hasattr(module, function_name):
+        raise AttributeError(f"Function '{function_name}' not found in {code_path}")
+    
+    function = getattr(module, function_name)
+    
+    # Verify it's callable
+    if not callable(function):
+        raise TypeError(f"'{function_name}' is not callable")
+    
+    return function
 
 class DynamicLangChainTool(BaseTool):
     """A LangChain tool that wraps a dynamically loaded function or API call"""
@@ -17,17 +152,31 @@ class DynamicLangChainTool(BaseTool):
     description: str
     args_schema: Optional[Type[BaseModel]] = None
     loaded_function: Optional[Any] = None
+    async_function: Optional[Any] = None
     api_config: Optional[APIConfig] = None
+    concurrency_limiter: Optional[ToolConcurrencyLimiter] = None
+    result_cache: Optional[TTLCache] = None
+    cache_key_fields: Optional[List[str]] = None
+    inflight: Optional[SingleFlight] = None
     
     def __init__(self, tool_config: ToolConfig, builtin_function=None, api_config=None, **kwargs):
         # Create the Pydantic schema for input validation
         args_schema = self._create_input_schema(tool_config.inputs)
         
         # Load the function - either from builtin, file, or create API wrapper
+        async_function = None
         if api_config is not None:
             loaded_function = self._create_api_function(api_config)
+            async_function = self._create_async_api_function(api_config)
         elif builtin_function is not None:
             loaded_function = builtin_function
+        elif tool_config.sandbox is not None:
+            # Imported here so multiprocessing is only set up for sandboxed tools
+            from .sandbox import SandboxedFunction
+            
+            if not os.path.exists(tool_config.code_path):
+                raise FileNotFoundError(f"Code file not found: {tool_config.code_path}")
+            loaded_function = SandboxedFunction(tool_config.code_path, tool_config.function_name, tool_config.sandbox)
         else:
             loaded_function = self._load_function_from_file(
                 tool_config.code_path, 
@@ -41,104 +190,175 @@ class DynamicLangChainTool(BaseTool):
             **kwargs
         )
         
+        # Coroutine functions are awaited natively by _arun
+        if async_function is None and inspect.iscoroutinefunction(loaded_function):
+            async_function = loaded_function
+        
         object.__setattr__(self, 'loaded_function', loaded_function)
+        object.__setattr__(self, 'async_function', async_function)
         object.__setattr__(self, 'api_config', api_config)
         
+        namespace = self._execution_namespace(tool_config, api_config)
+        
+        cache_config = tool_config.cache
+        if (cache_config is not None and cache_config.enabled and api_config is not None
+                and api_config.method.upper() not in IDEMPOTENT_METHODS):
+            # A cached result would stand in for a request that must reach the server
+            print(f"[WARNING] Ignoring cache for {api_config.name}: {api_config.method} is not idempotent")
+        elif cache_config is not None and cache_config.enabled:
+            # get_cache keeps the settings of its first caller, so each cache policy gets its own cache
+            cache_settings = json.dumps(cache_config.model_dump(), sort_keys=True)
+            settings_digest = hashlib.sha256(cache_settings.encode("utf-8")).hexdigest()[:12]
+            result_cache = get_cache(
+                f"{namespace}:{settings_digest}",
+                max_entries=cache_config.max_entries,
+                ttl_seconds=cache_config.ttl_seconds,
+                persist=cache_config.persist,
+            )
+            object.__setattr__(self, 'result_cache', result_cache)
+            object.__setattr__(self, 'cache_key_fields', cache_config.key_fields)
+        
+        if tool_config.coalesce:
+            if api_config is not None and api_config.method.upper() not in IDEMPOTENT_METHODS:
+                # Each call of a non-idempotent request must reach the server
+                print(f"[WARNING] Ignoring coalesce for {api_config.name}: {api_config.method} is not idempotent")
+            else:
+                object.__setattr__(self, 'inflight', get_singleflight(namespace))
+        
+    @staticmethod
+    def _execution_namespace(tool_config: ToolConfig, api_config: Optional[APIConfig]) -> str:
+        """
+        Identify what actually runs, so that only calls which would return the same
+        result share a result cache or an in-flight call.
+
+        API tools include everything that shapes the request or its result (headers,
+        fixed queries, credentials, projection, size cap), hashed so credentials never
+        end up in cache files.
+        """
+        if api_config is None:
+            return f"tool:{tool_config.code_path}:{tool_config.function_name}"
+        
+        request_config = api_config.model_dump(
+            include={"url", "method", "headers", "queries", "auth", "projection", "max_response_chars"},
+            by_alias=True,
+        )
+        digest = hashlib.sha256(json.dumps(request_config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        return f"tool:{api_config.method} {api_config.url}:{digest}"
+    
     def _load_function_from_file(self, code_path: str, function_name: str) -> Any:
         """Dynamically load a function from a Python file"""
-        if not os.path.exists(code_path):
-            raise FileNotFoundError(f"Code file not found: {code_path}")
+        return load_function_from_file(code_path, function_name)
+       
+    def _prepare_api_request(self, api_config: APIConfig, kwargs: dict) -> dict:
+        """Build the request arguments for an API call from APIConfig and tool kwargs"""
+        url = api_config.url
+        method = api_config.method.upper()
+        headers = api_config.headers.copy() if api_config.headers else {}
+        params = api_config.queries.copy() if api_config.queries else {}
         
-        # Create a module spec and load the module
-        spec = importlib.util.spec_from_file_location("dynamic_module", code_path)
-        if spec is None or spec.loader is None:
-            raise ImportError(f"Could not load module from {code_path}")
+        # Handle authentication
+        if api_config.auth and api_config.auth.type == "api-key" and api_config.auth.api_key:
+            auth_in = None
+            if hasattr(api_config.auth, 'in_'):
+                auth_in = api_config.auth.in_
+            
+            if auth_in == "header":
+                headers[api_config.auth.field] = api_config.auth.api_key
+            elif auth_in == "query":
+                params[api_config.auth.field] = api_config.auth.api_key
+                
+        # Handle different parameter types from kwargs
+        json_data = None
         
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        # Extract payload and params from kwargs if they exist
+        payload = kwargs.get('payload') or {}
+        extra_params = kwargs.get('params') or {}
         
-        # Get the specified function
-        if not hasattr(module, function_name):
-            raise AttributeError(f"Function '{function_name}' not found in {code_path}")
+        if method in ["POST", "PUT", "PATCH"]:
+            # For body methods, use payload as JSON body
+            json_data = payload
+            # Add extra params to query string
+            params.update(extra_params)
+        else:
+            # For GET and other methods, merge everything into query parameters
+            params.update(payload)
+            params.update(extra_params)
         
-        function = getattr(module, function_name)
+        return {
+            "method": method,
+            "url": url,
+            "headers": headers,
+            "params": params if params else None,
+            "json": json_data,
+        }
+
+    def _format_api_response(self, response, api_config: APIConfig) -> str:
+        """
+        Turn an HTTP response (requests or httpx) into the tool's string result.
+
+        JSON bodies are reduced to api_config.projection when one is set and serialized
+        compactly; every result is capped at api_config.max_response_chars, since it is
+        re-sent to the model on each later turn.
+        """
+        max_chars = api_config.max_response_chars
+        if response.status_code >= 400:
+            return truncate_text(f"API Error {response.status_code}: {response.text}", max_chars)
         
-        # Verify it's callable
-        if not callable(function):
-            raise TypeError(f"'{function_name}' is not callable")
+        try:
+            json_response = response.json()
+        except Exception:
+            # Fall back to text
+            return truncate_text(response.text, max_chars)
         
-        return function
-       
+        if api_config.projection:
+            json_response = project(json_response, api_config.projection)
+        return truncate_text(dumps_compact(json_response), max_chars)
+
     def _create_api_function(self, api_config: APIConfig):
         """Create a function that makes API calls based on APIConfig"""
+        retry_config = api_config.retry
         
         def api_function(**kwargs) -> str:
             response = None
             
             try:
-                # Prepare the request
-                url = api_config.url
-                method = api_config.method.upper()
-                headers = api_config.headers.copy() if api_config.headers else {}
-                params = api_config.queries.copy() if api_config.queries else {}
+                request_kwargs = self._prepare_api_request(api_config, kwargs)
+                breaker = get_circuit_breaker(request_kwargs["url"], retry_config)
+                attempts = max_attempts(request_kwargs["method"], retry_config)
                 
-                # Handle authentication
-                if api_config.auth and api_config.auth.type == "api-key" and api_config.auth.api_key:
-                    auth_in = None
-                    if hasattr(api_config.auth, 'in_'):
-                        auth_in = api_config.auth.in_
+                for attempt in range(attempts):
+                    retry_in = breaker.before_call()
+                    if retry_in is not None:
+                        return circuit_open_error(request_kwargs["url"], retry_in)
                     
-                    if auth_in == "header":
-                        headers[api_config.auth.field] = api_config.auth.api_key
-                    elif auth_in == "query":
-                        params[api_config.auth.field] = api_config.auth.api_key
-                        
-                # Handle different parameter types from kwargs
-                data = None
-                json_data = None
-                
-                # Extract payload and params from kwargs if they exist
-                payload = kwargs.get('payload', {})
-                extra_params = kwargs.get('params', {})
-                
-                if method in ["POST", "PUT", "PATCH"]:
-                    # For body methods, use payload as JSON body
-                    json_data = payload
-                    # Add extra params to query string
-                    params.update(extra_params)
-                else:
-                    # For GET and other methods, merge everything into query parameters
-                    params.update(payload)
-                    params.update(extra_params)
-                
-                # Make the request
-                response = requests.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    params=params if params else None,
-                    json=json_data,
-                    data=data,
-                    timeout=30
-                )
-                
-                # Handle response
-                if response.status_code >= 400:
-                    error_msg = f"API Error {response.status_code}: {response.text}"
-                    return error_msg
-                
-                try:
-                    json_response = response.json()
-                    result = json.dumps(json_response, indent=2)
-                    return result
-                except:
-                    # Fall back to text
-                    result = response.text
-                    return result
+                    is_last_attempt = attempt == attempts - 1
+                    try:
+                        # Make the request
+                        response = get_http_session().request(timeout=api_config.timeout_seconds, **request_kwargs)
+                    except requests.exceptions.RequestException as e:
+                        breaker.record_failure()
+                        if is_last_attempt:
+                            return f"Request Error: {str(e)}"
+                        time.sleep(retry_delay(attempt, retry_config))
+                        continue
+                    except BaseException:
+                        # An error that says nothing about the host; free a half-open probe
+                        breaker.release_trial()
+                        raise
+                    
+                    if counts_as_failure(response.status_code):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    
+                    if not is_last_attempt and is_retryable_status(response.status_code, retry_config):
+                        delay = retry_delay(attempt, retry_config, response.headers.get("Retry-After"))
+                        if delay is not None:
+                            time.sleep(delay)
+                            continue
+                    
+                    return self._format_api_response(response, api_config)
                             
-            except requests.exceptions.RequestException as e:
-                error_msg = f"Request Error: {str(e)}"
-                return error_msg
             except Exception as e:
                 error_msg = f"Error making API call: {str(e)}"
                 return error_msg
@@ -151,6 +371,64 @@ class DynamicLangChainTool(BaseTool):
                     print(f"Response: No response received (error occurred)")
         
         return api_function
+
+    def _create_async_api_function(self, api_config: APIConfig):
+        """Create a coroutine that makes API calls based on APIConfig without blocking the event loop"""
+        retry_config = api_config.retry
+        
+        async def async_api_function(**kwargs) -> str:
+            response = None
+            
+            try:
+                request_kwargs = self._prepare_api_request(api_config, kwargs)
+                breaker = get_circuit_breaker(request_kwargs["url"], retry_config)
+                attempts = max_attempts(request_kwargs["method"], retry_config)
+                
+                for attempt in range(attempts):
+                    retry_in = breaker.before_call()
+                    if retry_in is not None:
+                        return circuit_open_error(request_kwargs["url"], retry_in)
+                    
+                    is_last_attempt = attempt == attempts - 1
+                    try:
+                        response = await get_async_http_client().request(
+                            timeout=api_config.timeout_seconds, **request_kwargs
+                        )
+                    except httpx.HTTPError as e:
+                        breaker.record_failure()
+                        if is_last_attempt:
+                            return f"Request Error: {str(e)}"
+                        await asyncio.sleep(retry_delay(attempt, retry_config))
+                        continue
+                    except BaseException:
+                        # Cancelled, or an error that says nothing about the host; free a half-open probe
+                        breaker.release_trial()
+                        raise
+                    
+                    if counts_as_failure(response.status_code):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    
+                    if not is_last_attempt and is_retryable_status(response.status_code, retry_config):
+                        delay = retry_delay(attempt, retry_config, response.headers.get("Retry-After"))
+                        if delay is not None:
+                            await asyncio.sleep(delay)
+                            continue
+                    
+                    return self._format_api_response(response, api_config)
+                
+            except Exception as e:
+                error_msg = f"Error making API call: {str(e)}"
+                return error_msg
+            finally:
+                print(f"API CALL COMPLETED: {api_config.name}")
+                if response is not None:
+                    print(f"Response: {response}")
+                else:
+                    print(f"Response: No response received (error occurred)")
+        
+        return async_api_function
     
     def _create_input_schema(self, inputs: ToolInputConfig) -> Type[BaseModel]:
         """Create a Pydantic model for input validation based on ToolInputConfig"""
@@ -180,21 +458,74 @@ class DynamicLangChainTool(BaseTool):
             'int': int,
             'integer': int,
             'float': float,
+            'number': float,
             'bool': bool,
             'boolean': bool,
             'list': list,
+            'array': list,
             'dict': dict,
+            'object': dict,
             'any': Any
         }
         
         return type_mapping.get(type_string.lower(), str)
     
+    def _result_cache_key(self, kwargs: dict) -> Optional[str]:
+        if self.result_cache is None:
+            return None
+        key_fields = self.cache_key_fields
+        arguments = {field: kwargs.get(field) for field in key_fields} if key_fields else kwargs
+        return json.dumps(arguments, sort_keys=True, default=str)
+    
+    def _store_result(self, cache_key: Optional[str], result: str) -> None:
+        # Failures are retried on the next call rather than replayed from the cache
+        if cache_key is not None and not result.startswith(_ERROR_RESULT_PREFIXES):
+            self.result_cache.set(cache_key, result)
+    
+    def _inflight_key(self, kwargs: dict) -> str:
+        if self.api_config is not None:
+            # The resolved request (URL, headers, credentials, query, body), plus what shapes the result
+            api_config = self.api_config
+            call = {
+                "request": self._prepare_api_request(api_config, kwargs),
+                "projection": api_config.projection,
+                "max_response_chars": api_config.max_response_chars,
+            }
+        else:
+            # All arguments: calls that only share a cache key may still need separate executions
+            call = kwargs
+        return json.dumps(call, sort_keys=True, default=str)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this tool's result cache (empty if caching is off)"""
+        if self.result_cache is None:
+            return {}
+        return self.result_cache.stats()
+    
     def _run(self, run_manager: Optional[CallbackManagerForToolRun] = None, **kwargs) -> str:
+        cache_key = self._result_cache_key(kwargs)
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        if self.inflight is None:
+            result = self._execute(**kwargs)
+        else:
+            result = self.inflight.do(self._inflight_key(kwargs), lambda: self._execute(**kwargs))
+        self._store_result(cache_key, result)
+        return result
+    
+    def _execute(self, **kwargs) -> str:
         try:
             if self.loaded_function is None:
                 return "Error: No function loaded"
                 
-            result = self.loaded_function(**kwargs)
+            if self.async_function is not None and self.async_function is self.loaded_function:
+                # Async user function called from a sync run
+                result = asyncio.run(self.async_function(**kwargs))
+            else:
+                result = self.loaded_function(**kwargs)
             
             return str(result)
                 
@@ -203,6 +534,45 @@ class DynamicLangChainTool(BaseTool):
             print(f"[DEBUG] Tool execution error: {error_msg}")
             return error_msg
 
+    async def _arun(self, run_manager: Optional[AsyncCallbackManagerForToolRun] = None, **kwargs) -> str:
+        # Cache hits don't take a concurrency slot
+        cache_key = self._result_cache_key(kwargs)
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Coalesced callers wait on the shared call without taking a slot either
+        if self.inflight is None:
+            result = await self._alimited_execute(**kwargs)
+        else:
+            result = await self.inflight.ado(self._inflight_key(kwargs), lambda: self._alimited_execute(**kwargs))
+        
+        self._store_result(cache_key, result)
+        return result
+    
+    async def _alimited_execute(self, **kwargs) -> str:
+        if self.concurrency_limiter is None:
+            return await self._aexecute(**kwargs)
+        async with self.concurrency_limiter.semaphore():
+            return await self._aexecute(**kwargs)
+    
+    async def _aexecute(self, **kwargs) -> str:
+        if self.async_function is None:
+            # Sync functions run in a worker thread so the event loop stays free
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_tool_executor(), lambda: self._execute(**kwargs))
+        
+        try:
+            result = await self.async_function(**kwargs)
+            
+            return str(result)
+        
+        except Exception as e:
+            error_msg = f"Error executing function: {str(e)}"
+            print(f"[DEBUG] Tool execution error: {error_msg}")
+            return error_msg
+
 def create_langchain_tool(tool_config: ToolConfig, builtin_function=None, api_config=None) -> DynamicLangChainTool:
     """
     Factory function to create a LangChain tool from a ToolConfig
@@ -219,7 +589,9 @@ def create_api_tool_from_config(api_config: APIConfig, inputs: List[FieldConfig]
         inputs=ToolInputConfig(fields=inputs),
         output=ToolOutputConfig(fields=outputs),
         code_path="__api__",
-        function_name=api_config.name.lower().replace(" ", "_")
+        function_name=api_config.name.lower().replace(" ", "_"),
+        cache=api_config.cache,
+        coalesce=api_config.coalesce,
     )
     
     return create_langchain_tool(tool_config, api_config=api_config)
\ No newline at end of file
@@ -7,7 +7,7 @@ from asteval import Interpreter
 from typing import Dict, Any, List
 from urllib.parse import urlparse, parse_qs
 
-from .agent_models import ToolConfig, ToolInputConfig, ToolOutputConfig, FieldConfig
+from .agent_models import ToolConfig, ToolInputConfig, ToolOutputConfig, FieldConfig, ToolCacheConfig
 
 # Initialize unit registry globally for the module
 _ureg = UnitRegistry()
@@ -200,6 +200,7 @@ UTILITY_FUNCTIONS = {
 }
 
 # Tool configurations for each builtin tool
+# Deterministic utilities carry a result cache, repeated calls skip execution
 UTILITY_CONFIGS = [
     ToolConfig(
         name="Regex Extract",
@@ -224,7 +225,8 @@ UTILITY_CONFIGS = [
             FieldConfig(name="result", type="float", description="Result of the calculation", required=True)
         ]),
         code_path="__builtin__",
-        function_name="calculator"
+        function_name="calculator",
+        cache=ToolCacheConfig(ttl_seconds=3600)
     ),
     ToolConfig(
         name="Date Parser",
@@ -278,7 +280,8 @@ UTILITY_CONFIGS = [
             FieldConfig(name="converted_value", type="float", description="Converted value", required=True)
         ]),
         code_path="__builtin__",
-        function_name="unit_converter"
+        function_name="unit_converter",
+        cache=ToolCacheConfig(ttl_seconds=3600)
     ),
     ToolConfig(
         name="Text Summary",
@@ -329,6 +332,7 @@ UTILITY_CONFIGS = [
             FieldConfig(name="components", type="dict", description="URL components (scheme, domain, path, query, fragment)", required=True)
         ]),
         code_path="__builtin__",
-        function_name="url_parser"
+        function_name="url_parser",
+        cache=ToolCacheConfig(ttl_seconds=3600)
     )
 ]
\ No newline at end of file
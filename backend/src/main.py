@@ -1,14 +1,24 @@
 from .send_files import copy_folder
-from databricks.vector_search.index import VectorSearchIndex
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from PyPDF2 import PdfReader
+from .agent_runner.agent_models import AgentSystemConfig
+from .agent_runner.http_pool import aclose_http_client, close_http_session
+from .agent_runner.ingestion import ingest_document, open_index
+from .agent_runner.make_agent import build_agent, load_json_file
+from fastapi import Body, FastAPI, File, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 import json
+from contextlib import asynccontextmanager
 from pathlib import Path
-import uuid
+from typing import Any, Dict, Optional
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the pooled HTTP clients shared by API tools
+    await aclose_http_client()
+    close_http_session()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def read_root():
@@ -25,46 +35,66 @@ def copy_agent_runner(destination: str):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-"""   
-@app.post("/upload-docs")
-async def upload_and_chunk(file: UploadFile = File(...)):
+@app.post("/agents/{agent_name}/stream")
+async def stream_agent(agent_name: str, input_data: Dict[str, Any] = Body(...), session_id: Optional[str] = None):
+    """
+    Run an agent and stream its progress as Server-Sent Events.
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=900,
-        chunk_overlap=200,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""],
-    )
-    content = ""
+    Each event is named after its type (token, tool_call, tool_result, final, error)
+    and carries the JSON-encoded event as data.
+    """
+    try:
+        # Building may hit the router on a cold cache; keep it off the event loop
+        agent = await asyncio.to_thread(build_agent, agent_name)
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-    # Handle PDF files
-    if file.filename.endswith(".pdf"):
-        pdf_reader = PdfReader(file.file)
-        for page in pdf_reader.pages:
-            content += page.extract_text() or ""
+    async def event_stream():
+        async for event in agent.astream_output(input_data, session_id=session_id):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
 
-    # Handle Markdown or plain text files
-    elif file.filename.endswith(".md") or file.content_type.startswith("text/"):
-        content = (await file.read()).decode("utf-8")
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    else:
-        return JSONResponse(
-            status_code=400,
-            content={"error": "Unsupported file type"}
-        )
+@app.post("/upload-docs")
+async def upload_docs(agent_name: str, file: UploadFile = File(...), document_id: Optional[str] = None):
+    """
+    Chunk an uploaded PDF, Markdown or text file into the vector index of an agent's RAG config.
+
+    Pages are extracted and upserted in batches as they are read, so large documents
+    neither load fully into memory nor block the event loop. Uploading a new version
+    of a document (same document_id, the filename by default) replaces its chunks,
+    re-embedding only the ones that changed.
+    """
+    try:
+        config = AgentSystemConfig(**await asyncio.to_thread(load_json_file, agent_name))
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-    # Split into chunks
-    chunks = splitter.split_text(content)
+    if config.rag is None:
+        return JSONResponse(status_code=400, content={"error": f"Agent {agent_name} has no RAG configuration"})
 
-    # Prepare upsert payload
-    docs = []
-    for chunk in chunks:
-        docs.append({
-            "id": str(uuid.uuid4()),   # unique id for each chunk
-            "text": chunk              
-        })
+    try:
+        index = await asyncio.to_thread(open_index, config.rag)
+        keyword_index = None
+        if config.rag.hybrid_search:
+            # Imported here so the app starts without loading numpy (keyword_index imports local_index)
+            from .agent_runner.keyword_index import get_keyword_index
 
-    client.upsert(docs)
+            keyword_index = await asyncio.to_thread(get_keyword_index, config.rag)
+        result = await ingest_document(
+            index, file.file, file.filename or "", file.content_type or "",
+            chunk_size=config.rag.chunk_size, index_name=config.rag.index_name, document_id=document_id,
+            keyword_index=keyword_index,
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-    return {"status": "success", "chunks_upserted": len(docs)}
-"""
\ No newline at end of file
+    return {"status": "success", **result}
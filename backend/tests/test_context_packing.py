@@ -0,0 +1,22 @@
+from agent_runner.context_packing import estimate_tokens, pack_context, truncate_to_sentences
+
+
+def test_truncate_keeps_whole_sentences():
+    text = "First sentence here. Second one is longer than that."
+    assert truncate_to_sentences(text, 8) == "First sentence here."
+
+
+def test_truncate_without_sentence_end_cuts_at_word_boundary():
+    text = "col_a | col_b | col_c " * 20
+    truncated = truncate_to_sentences(text, 20)
+    assert truncated.endswith("...")
+    assert text.startswith(truncated[:-3])
+    assert truncated[:-3].endswith("col_c") or truncated[:-3].endswith("|")
+    assert estimate_tokens(truncated) <= 20
+
+
+def test_top_chunk_without_sentence_end_is_kept():
+    chunk = ("col_a | col_b | col_c " * 20)[:400]
+    packed = pack_context([chunk], 50)
+    assert len(packed) == 1
+    assert estimate_tokens(packed[0]) <= 50
@@ -0,0 +1,39 @@
+import io
+
+from agent_runner.ingestion import TEXT_BLOCK_SIZE, iter_chunks, iter_document_pages
+
+
+def _long_text() -> str:
+    lines = [f"Line {i} of the document, with a little text after it." for i in range(4000)]
+    return "\n".join(lines) + "\n"
+
+
+def test_text_file_larger_than_a_block_round_trips():
+    text = _long_text()
+    data = text.encode("utf-8")
+    assert len(data) > 2 * TEXT_BLOCK_SIZE
+
+    pages = list(iter_document_pages(io.BytesIO(data), "notes.txt", "text/plain"))
+    assert len(pages) > 1
+    assert "".join(pages) == text
+
+
+def test_chunks_of_a_text_file_are_taken_from_its_text():
+    text = _long_text()
+    pages = iter_document_pages(io.BytesIO(text.encode("utf-8")), "notes.md")
+    for chunk in iter_chunks(pages, 500):
+        assert chunk in text
+
+
+def test_edit_without_paragraph_breaks_changes_few_chunks():
+    text = _long_text()
+    edited = text.replace("Line 20 of the document,", "Line 20 of the edited document, now a bit longer,", 1)
+    assert edited != text
+
+    def chunks(document: str):
+        return set(iter_chunks(iter_document_pages(io.BytesIO(document.encode("utf-8")), "notes.txt", "text/plain"), 500))
+
+    before = chunks(text)
+    after = chunks(edited)
+    assert len(before) > 100
+    assert len(after - before) <= 8
@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from agent_runner.json_repair import parse_json_lenient, repair_json
+
+# Each <case>.txt is a model output; <case>.json holds the expected parse (null when nothing should be recovered)
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "model_outputs"
+CORPUS = sorted(CORPUS_DIR.glob("*.txt"))
+
+
+@pytest.mark.parametrize("output_path", CORPUS, ids=[path.stem for path in CORPUS])
+def test_corpus(output_path):
+    expected = json.loads(output_path.with_suffix(".json").read_text())
+    assert parse_json_lenient(output_path.read_text()) == expected
+
+
+def test_corpus_is_not_empty():
+    assert len(CORPUS) >= 20
+
+
+def test_strict_json_is_returned_as_is():
+    assert parse_json_lenient('[1, 2, 3]') == [1, 2, 3]
+
+
+def test_largest_object_wins():
+    text = '{"a": 1} and then {"a": 1, "b": {"c": 2}}'
+    assert parse_json_lenient(text) == {"a": 1, "b": {"c": 2}}
+
+
+@pytest.mark.parametrize("broken, expected", [
+    ("{'a': 'it\\'s'}", {"a": "it's"}),
+    ('{"a": [1, 2,], }', {"a": [1, 2]}),
+    ('{"a": 1 // comment\n}', {"a": 1}),
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ("{'a': None, 'b': False}", {"a": None, "b": False}),
+    ("{'text': 'line one\nline two'}", {"text": "line one\nline two"}),
+])
+def test_repair_json(broken, expected):
+    assert json.loads(repair_json(broken)) == expected